@@ -3,7 +3,10 @@ Configuration file for Template-Based Extraction Tool
 Modify these settings according to your needs
 """
 
+import copy
+import functools
 import os
+from types import MappingProxyType
 
 # Default configuration
 DEFAULT_CONFIG = {
@@ -13,32 +16,75 @@ DEFAULT_CONFIG = {
         "output_xlsx": "./output/results.xlsx"  # Output Excel file path
     },
     "llm": {
-        "api_key": os.getenv("OPENAI_API_KEY", ""),
-        "base_url": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
-        "model": os.getenv("OPENAI_MODEL", "gpt-4-turbo"),
+        "api_key": "",                        # Overridden by OPENAI_API_KEY
+        "base_url": "https://api.openai.com/v1",  # Overridden by OPENAI_BASE_URL
+        "model": "gpt-4-turbo",               # Overridden by OPENAI_MODEL
         "temperature": 0.0,
         "max_tokens": 6000,
         "timeout": 120,
-        "max_retries": 5
+        "max_retries": 5,
+        "max_concurrency": 8,                 # Maximum in-flight LLM requests
+        "requests_per_minute": None,          # RPM limit (None = learn from x-ratelimit headers)
+        "tokens_per_minute": None,            # TPM limit (None = learn from x-ratelimit headers)
+        "use_batch_api": False,               # Submit all requests as one Batch API job (24h window)
+        "batch_poll_interval": 30,            # Seconds between Batch API status checks
+        "structured_output": True,            # Request JSON matching a strict schema (response_format)
+        "stream": True                        # Stream responses and parse table rows as they arrive
     },
     "runtime": {
         "chunk_field_size": 20,        # Maximum fields per batch
-        "max_chars_per_doc": 30000,    # Text truncation to avoid excessive length
-        "debug_dir": "./debug_tables", # Save original output and repair text
-        "use_repair_call": True        # Whether to make repair call on parsing failure
+        "pack_field_chunks": True,     # Request all field batches in one call per PDF
+        "max_chars_per_doc": 60000,    # Stop reading PDF pages after this many characters
+        "max_input_tokens": 8000,      # Document truncation in tokens (tiktoken; ~4 chars/token without it)
+        "map_reduce_long_docs": False, # Extract from overlapping text windows instead of truncating
+        "window_tokens": 8000,         # Tokens per text window when map_reduce_long_docs is on
+        "stride_tokens": 6000,         # Tokens between window starts (window - stride = overlap)
+        "pdf_workers": None,           # PDF text extraction processes (None = CPU count)
+        "debug": False,                # Log prompts and responses to debug_dir
+        "debug_dir": "./debug_tables", # One JSONL debug log per run
+        "cache_dir": "./extraction_cache", # Reuse results for unchanged PDFs (None to disable)
+        "emit_xlsx": True              # Also write output_xlsx next to the Parquet output
     }
 }
 
-def get_config():
-    """Get configuration with environment variable overrides"""
-    config = DEFAULT_CONFIG.copy()
-    
+def _freeze(value):
+    """Recursively wrap dicts in read-only mapping proxies"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    return value
+
+def _build_config() -> dict:
+    """Build a fresh configuration dict with environment variable overrides"""
+    env = os.environ
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    paths = config["paths"]
+    llm = config["llm"]
+
     # Override with environment variables if available
-    if os.getenv("PDF_FOLDER"):
-        config["paths"]["pdf_folder"] = os.getenv("PDF_FOLDER")
-    if os.getenv("TEMPLATE_XLSX"):
-        config["paths"]["template_xlsx"] = os.getenv("TEMPLATE_XLSX")
-    if os.getenv("OUTPUT_XLSX"):
-        config["paths"]["output_xlsx"] = os.getenv("OUTPUT_XLSX")
-    
-    return config
\ No newline at end of file
+    if (value := env.get("PDF_FOLDER")):
+        paths["pdf_folder"] = value
+    if (value := env.get("TEMPLATE_XLSX")):
+        paths["template_xlsx"] = value
+    if (value := env.get("OUTPUT_XLSX")):
+        paths["output_xlsx"] = value
+    if (value := env.get("OPENAI_API_KEY")) is not None:
+        llm["api_key"] = value
+    if (value := env.get("OPENAI_BASE_URL")) is not None:
+        llm["base_url"] = value
+    if (value := env.get("OPENAI_MODEL")) is not None:
+        llm["model"] = value
+
+    return config
+
+@functools.lru_cache(maxsize=1)
+def get_config():
+    """Get read-only configuration with environment variable overrides.
+
+    The result is resolved once and cached; call get_config.cache_clear()
+    to pick up changed environment variables.
+    """
+    return _freeze(_build_config())
+
+def get_mutable_config() -> dict:
+    """Get a private, modifiable copy of the configuration"""
+    return _build_config()
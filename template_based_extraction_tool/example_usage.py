@@ -26,9 +26,9 @@ def example_usage():
         },
         "runtime": {
             "chunk_field_size": 15,        # Process fewer fields per batch
-            "max_chars_per_doc": 25000,    # Shorter document limit
-            "debug_dir": "./my_debug",     # Custom debug directory
-            "use_repair_call": True
+            "max_chars_per_doc": 25000,    # Read fewer PDF pages
+            "max_input_tokens": 6000,      # Shorter document limit
+            "debug_dir": "./my_debug"      # Custom debug directory
         }
     }
     
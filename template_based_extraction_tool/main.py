@@ -7,30 +7,507 @@ A simple template-driven PDF data extraction tool using LLM
 import os
 import sys
 import json
+import asyncio
+import hashlib
+import importlib.util
+import time
+from datetime import datetime
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import pdfplumber
-import PyPDF2
+import pypdf
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
 from pathlib import Path
-from tqdm import tqdm
-from openai import OpenAI
+from tqdm.asyncio import tqdm
+from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
 import re
 from typing import Dict, List, Tuple, Optional
 import logging
 from config import get_config
 
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Separates the per-group tables of a packed multi-chunk response
+CHUNK_SENTINEL = "===CHUNK {index}==="
+_CHUNK_SENTINEL_RE = re.compile(r'^\s*===CHUNK (\d+)===\s*$', re.MULTILINE)
+# Column separator for tables that are not tab-separated
+_SPLIT_RE = re.compile(r'\s{2,}|\|')
+
+# Result column holding, per row, the columns that match no template field (JSON object)
+UNMATCHED_COLUMN = "Unmatched_Columns"
+
+# Approximate characters per token when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+# Bump when prompts or parsing change so cached extraction results are not reused
+PROMPT_VERSION = "2"
+
+def json_dumps(obj) -> bytes:
+    """Serialize to UTF-8 JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+# orjson.JSONDecodeError subclasses ValueError, like json's
+json_loads = orjson.loads if orjson is not None else json.loads
+
+class StreamingTableParser:
+    """Incrementally split a table response into rows as its text arrives.
+    
+    Each line is split as soon as it is complete, so a streamed response is
+    parsed while the rest is still being generated. A ===CHUNK n=== line starts
+    the table of field group n in packed responses; rows before any sentinel
+    belong to section 0.
+    """
+    
+    def __init__(self):
+        self._pending = ""
+        self._section = 0
+        self._modes = {}
+        self.sections = {}
+    
+    def feed(self, text: str):
+        self._pending += text
+        *complete, self._pending = self._pending.split('\n')
+        for line in complete:
+            self._add_line(line)
+    
+    def close(self) -> Dict[int, List[List[str]]]:
+        """Flush the last line and return the rows of each section"""
+        if self._pending:
+            self._add_line(self._pending)
+            self._pending = ""
+        return self.sections
+    
+    def _add_line(self, line: str):
+        line = line.strip()
+        if not line:
+            return
+        sentinel = _CHUNK_SENTINEL_RE.match(line)
+        if sentinel:
+            self._section = int(sentinel.group(1))
+            return
+        
+        # The first line of a section (its header) decides the column separator
+        mode = self._modes.setdefault(
+            self._section, 'tab' if '\t' in line else 'pipe' if '|' in line else 'space'
+        )
+        if mode == 'tab':
+            row = line.split('\t')
+        else:
+            if mode == 'pipe':
+                # Pipe-delimited (markdown-style) table needs no regex
+                row = line.split('|')
+            else:
+                # Try space-separated or other formats
+                row = _SPLIT_RE.split(line)
+            row = [cell.strip() for cell in row if cell.strip()]
+        self.sections.setdefault(self._section, []).append(row)
+
+class TokenBucket:
+    """Per-minute token bucket; unlimited until a capacity is configured or learned"""
+    
+    def __init__(self, capacity: Optional[float] = None):
+        self.configured = capacity
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = None
+    
+    def _refill(self):
+        now = time.monotonic()
+        if self.capacity is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+    
+    async def acquire(self, amount: float):
+        """Wait until amount tokens are available and take them"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.capacity is None:
+                    return
+                needed = min(amount, self.capacity)
+                if self.tokens >= needed:
+                    self.tokens -= needed
+                    return
+                await asyncio.sleep((needed - self.tokens) * 60 / self.capacity)
+    
+    def update(self, limit: Optional[float], remaining: Optional[float]):
+        """Align the bucket with the limit and remaining quota reported by the server"""
+        self._refill()
+        if limit is not None:
+            # Never exceed a limit configured by the user
+            if self.configured is not None:
+                limit = min(limit, self.configured)
+            if self.capacity is None:
+                self.tokens = limit
+            self.capacity = limit
+        if remaining is not None and self.tokens is not None:
+            self.tokens = min(self.tokens, remaining)
+
+class RateLimiter:
+    """RPM/TPM-aware limiter driven by config and x-ratelimit-* response headers"""
+    
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+    
+    async def acquire(self, estimated_tokens: int):
+        await self.requests.acquire(1)
+        await self.tokens.acquire(estimated_tokens)
+    
+    def update_from_headers(self, headers):
+        def header_value(name):
+            try:
+                return float(headers.get(name))
+            except (TypeError, ValueError):
+                return None
+        
+        self.requests.update(header_value("x-ratelimit-limit-requests"),
+                             header_value("x-ratelimit-remaining-requests"))
+        self.tokens.update(header_value("x-ratelimit-limit-tokens"),
+                           header_value("x-ratelimit-remaining-tokens"))
+
+def extract_pdf_text(pdf_path: str, max_chars: int) -> str:
+    """Extract text from PDF using pypdfium2, fallback to pdfplumber, then pypdf.
+    
+    Pages are read only until max_chars is reached. Module-level so it can
+    run in a ProcessPoolExecutor worker.
+    """
+    if pdfium is not None:
+        try:
+            # Try pypdfium2 first (native PDFium, much faster than pdfminer)
+            parts, size = [], 0
+            pdf = pdfium.PdfDocument(pdf_path)
+            try:
+                for page in pdf:
+                    textpage = page.get_textpage()
+                    page_text = textpage.get_text_range()
+                    textpage.close()
+                    page.close()
+                    if page_text:
+                        parts.append(page_text)
+                        size += len(page_text) + 1
+                        if size >= max_chars:
+                            break
+            finally:
+                pdf.close()
+            text = "\n".join(parts)
+            if text.strip():
+                return text[:max_chars]
+        except Exception as e:
+            logger.warning(f"pypdfium2 failed for {pdf_path}: {e}")
+    
+    try:
+        # Fallback to pdfplumber
+        parts, size = [], 0
+        with pdfplumber.open(pdf_path) as pdf:
+            for page in pdf.pages:
+                page_text = page.extract_text()
+                # Release the parsed page layout as soon as its text is taken
+                page.flush_cache()
+                if page_text:
+                    parts.append(page_text)
+                    size += len(page_text) + 1
+                    if size >= max_chars:
+                        break
+        text = "\n".join(parts)
+        if text.strip():
+            return text[:max_chars]
+    except Exception as e:
+        logger.warning(f"pdfplumber failed for {pdf_path}: {e}")
+    
+    try:
+        # Fallback to pypdf; layout is irrelevant downstream, so use the plain extractor
+        parts, size = [], 0
+        with open(pdf_path, 'rb') as file:
+            reader = pypdf.PdfReader(file)
+            for page in reader.pages:
+                page_text = page.extract_text(extraction_mode="plain") or ""
+                parts.append(page_text)
+                size += len(page_text) + 1
+                if size >= max_chars:
+                    break
+        return "\n".join(parts)[:max_chars]
+    except Exception as e:
+        logger.error(f"All PDF extractors failed for {pdf_path}: {e}")
+        return ""
+
+class ResultWriter:
+    """Append per-PDF results to the Parquet output as each PDF completes.
+    
+    Only the rows of the PDF being written are held in memory; every column
+    is stored as a string, in template order. Result columns that match no
+    template field are kept per row as a JSON object in the Unmatched_Columns
+    side column, which the xlsx output expands back into separate columns
+    after the template fields. Parquet rows follow completion
+    order; the xlsx output is sorted back into input file order. Without
+    pyarrow the results are kept in memory and written to Excel only.
+    """
+    
+    def __init__(self, output_xlsx: str, columns: List[str], emit_xlsx: bool = True,
+                 file_order: Optional[List[str]] = None):
+        self.output_xlsx = output_xlsx
+        self.parquet_path = str(Path(output_xlsx).with_suffix('.parquet'))
+        self.columns = columns
+        self.emit_xlsx = emit_xlsx or pa is None
+        self.output_columns = columns + [UNMATCHED_COLUMN]
+        self.schema = pa.schema([(column, pa.string()) for column in self.output_columns]) if pa is not None else None
+        # Input position of each file name, used to order the xlsx rows
+        self.file_rank = {name: rank for rank, name in enumerate(file_order or [])}
+        self._normalized = {column.strip().casefold(): column for column in columns}
+        self.row_count = 0
+        self._writer = None
+        self._frames = []
+    
+    def _align_columns(self, result_df: pd.DataFrame) -> pd.DataFrame:
+        """Match result columns to the template.
+        
+        Table output uses the header the LLM wrote, which may differ from the
+        template field names. Headers differing only in case or whitespace are
+        renamed; any other column is never guessed onto a template field but
+        kept in the Unmatched_Columns side column.
+        """
+        unknown = [column for column in result_df.columns if column not in self.columns]
+        if not unknown:
+            return result_df
+        
+        renames = {}
+        for column in unknown:
+            target = self._normalized.get(str(column).strip().casefold())
+            if target is not None and target not in result_df.columns and target not in renames.values():
+                renames[column] = target
+        unknown = [column for column in unknown if column not in renames]
+        result_df = result_df.rename(columns=renames)
+        if unknown:
+            logger.warning(f"Keeping result columns not in the template in {UNMATCHED_COLUMN}: {unknown}")
+            names = [str(column) for column in unknown]
+            extras = [
+                json_dumps({name: None if pd.isna(value) else str(value)
+                            for name, value in zip(names, row)}).decode('utf-8')
+                for row in result_df[unknown].itertuples(index=False, name=None)
+            ]
+            result_df = result_df.drop(columns=unknown).assign(**{UNMATCHED_COLUMN: extras})
+        return result_df
+    
+    def write(self, result_df: pd.DataFrame):
+        if result_df.empty:
+            return
+        result_df = self._align_columns(result_df).reindex(columns=self.output_columns).astype("string")
+        self.row_count += len(result_df)
+        if self.schema is None:
+            self._frames.append(result_df)
+            return
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.parquet_path, self.schema, compression='zstd')
+        self._writer.write_table(pa.Table.from_pandas(result_df, schema=self.schema, preserve_index=False))
+    
+    def _expand_unmatched(self, final_df: pd.DataFrame) -> pd.DataFrame:
+        """Replace the Unmatched_Columns side column with one column per unmatched header"""
+        extras = final_df.pop(UNMATCHED_COLUMN)
+        if not extras.notna().any():
+            return final_df
+        expanded = pd.DataFrame(
+            [json_loads(value) if pd.notna(value) else {} for value in extras],
+            index=final_df.index
+        )
+        # An unmatched header never overwrites a template column
+        expanded.columns = [column if column not in final_df.columns else f"{column} (unmatched)"
+                            for column in expanded.columns]
+        return pd.concat([final_df, expanded], axis=1)
+    
+    def close(self):
+        """Finalize the Parquet file; safe to call more than once"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            logger.info(f"Results saved to: {self.parquet_path}")
+    
+    def write_excel(self):
+        """Write output_xlsx from the finished Parquet file (or in-memory results)"""
+        if not self.row_count:
+            logger.warning("No data extracted from any PDF files")
+            return
+        if self.emit_xlsx:
+            if self._frames:
+                final_df = pd.concat(self._frames, ignore_index=True)
+            else:
+                final_df = pd.read_parquet(self.parquet_path)
+            if self.file_rank:
+                # Stable sort keeps each file's rows in extraction order
+                ranks = final_df['File_Name'].map(self.file_rank).fillna(len(self.file_rank))
+                final_df = final_df.iloc[ranks.argsort(kind='stable')]
+            final_df = self._expand_unmatched(final_df)
+            final_df.to_excel(self.output_xlsx, sheet_name='Results', index=False)
+            logger.info(f"Results saved to: {self.output_xlsx}")
+        logger.info(f"Total records extracted: {self.row_count}")
+
 class TemplateExtractor:
     def __init__(self, config: Dict):
         self.config = config
-        self.client = OpenAI(
-            api_key=config["llm"]["api_key"],
-            base_url=config["llm"]["base_url"]
+        # One pooled HTTP client shared by every request for the whole run
+        self.aclient = self._build_client()
+        # Created lazily inside the running event loop
+        self._llm_semaphore = None
+        self.encoding = self._load_encoding(config["llm"]["model"])
+        self.rate_limiter = RateLimiter(
+            config["llm"].get("requests_per_minute"),
+            config["llm"].get("tokens_per_minute")
         )
-        os.makedirs(config["runtime"]["debug_dir"], exist_ok=True)
+        # Digest of the template fields and extraction settings, set by load_template
+        self._extraction_digest = None
+        # blake2b content digest of each PDF, shared by duplicate grouping and the cache key
+        self._pdf_digests = {}
+        # Ask for schema-constrained JSON instead of free-form tables
+        self.structured_output = config["llm"].get("structured_output", True)
+        # CPU-bound PDF parsing runs in worker processes; started on first use, shut down after each run
+        self.pool = None
+        # One JSONL debug log per run, opened on first write when debug is enabled
+        self.debug = config["runtime"].get("debug", False)
+        self._debug_handle = None
+        self._debug_lock = None
+        if self.debug:
+            os.makedirs(config["runtime"]["debug_dir"], exist_ok=True)
         os.makedirs(os.path.dirname(config["paths"]["output_xlsx"]), exist_ok=True)
+        
+        # Cache of extraction results keyed by PDF content, template and model
+        self.cache = None
+        cache_dir = config["runtime"].get("cache_dir")
+        if cache_dir:
+            if diskcache is not None:
+                self.cache = diskcache.Cache(cache_dir)
+            else:
+                logger.warning("diskcache not installed, extraction result caching disabled")
+    
+    def _build_client(self) -> AsyncOpenAI:
+        """Create the LLM client; rebuilt for a new run once the previous one was closed.
+        
+        SDK retries are disabled: chat requests are retried by _chat_completion,
+        which passes every attempt through the rate limiter.
+        """
+        return AsyncOpenAI(
+            api_key=self.config["llm"]["api_key"],
+            base_url=self.config["llm"]["base_url"],
+            http_client=self._build_http_client(),
+            max_retries=0
+        )
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Return the PDF parsing process pool, starting it on first use"""
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.config["runtime"].get("pdf_workers") or os.cpu_count()
+            )
+        return self.pool
+    
+    def _build_http_client(self):
+        """Keep-alive HTTP client sized to max_concurrency, multiplexed over HTTP/2 when h2 is installed"""
+        if httpx is None:
+            return None
+        connections = self.config["llm"].get("max_concurrency", 8) * 2
+        return httpx.AsyncClient(
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+            timeout=httpx.Timeout(float(self.config["llm"].get("timeout", 120)), connect=5.0)
+        )
+    
+    def _load_encoding(self, model: str):
+        """Load the tiktoken encoding for the model, or None to fall back to characters"""
+        if tiktoken is None:
+            return None
+        try:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                return tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"tiktoken encoding unavailable ({e}), truncating by characters")
+            return None
+    
+    def _count_tokens(self, content: str) -> int:
+        if self.encoding is None:
+            return len(content) // CHARS_PER_TOKEN
+        return len(self.encoding.encode(content, disallowed_special=()))
+    
+    def truncate_to_tokens(self, text: str) -> Tuple[str, int]:
+        """Truncate document text to max_input_tokens, tokenizing it only once.
+        
+        Returns the text and its token count, so the rate limiter's estimate
+        does not encode the document again.
+        """
+        max_input_tokens = self.config["runtime"].get("max_input_tokens")
+        if self.encoding is None:
+            if max_input_tokens:
+                text = text[:max_input_tokens * CHARS_PER_TOKEN]
+            return text, len(text) // CHARS_PER_TOKEN
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if max_input_tokens and len(tokens) > max_input_tokens:
+            tokens = tokens[:max_input_tokens]
+            text = self.encoding.decode(tokens)
+        return text, len(tokens)
+    
+    def split_into_windows(self, text: str) -> List[Tuple[str, int]]:
+        """Split document text into overlapping (window text, token count) windows of window_tokens every stride_tokens"""
+        runtime = self.config["runtime"]
+        window = runtime.get("window_tokens") or runtime.get("max_input_tokens") or 8000
+        stride = runtime.get("stride_tokens") or window
+        if self.encoding is None:
+            units = text
+            window, stride = window * CHARS_PER_TOKEN, stride * CHARS_PER_TOKEN
+        else:
+            units = self.encoding.encode(text, disallowed_special=())
+        
+        windows = []
+        for start in range(0, len(units), stride):
+            piece = units[start:start + window]
+            if self.encoding is None:
+                windows.append((piece, len(piece) // CHARS_PER_TOKEN))
+            else:
+                windows.append((self.encoding.decode(piece), len(piece)))
+            if start + window >= len(units):
+                break
+        return windows or [(text, 0)]
+    
+    def document_windows(self, text: str) -> List[Tuple[str, int]]:
+        """(text, token count) windows to extract from: overlapping windows when map-reduce is on, else one truncated text"""
+        if self.config["runtime"].get("map_reduce_long_docs", False):
+            return self.split_into_windows(text)
+        return [self.truncate_to_tokens(text)]
     
     def load_template(self, template_path: str) -> Tuple[List[str], List[str], List[str], List[str]]:
         """Load 4-row template from Excel file"""
@@ -43,6 +520,7 @@ class TemplateExtractor:
             field_descriptions = [str(x) for x in df.iloc[1].dropna().tolist()]
             example1 = [str(x) for x in df.iloc[2].dropna().tolist()]
             example2 = [str(x) for x in df.iloc[3].dropna().tolist()]
+            self._extraction_digest = self._settings_digest(field_names, field_descriptions, example1, example2)
             
             logger.info(f"Loaded template with {len(field_names)} fields")
             return field_names, field_descriptions, example1, example2
@@ -50,45 +528,77 @@ class TemplateExtractor:
             logger.error(f"Error loading template: {e}")
             raise
     
+    def _settings_digest(self, *template_rows: List[str]) -> str:
+        """Digest of the template content and every setting that changes the extracted rows"""
+        runtime, llm = self.config["runtime"], self.config["llm"]
+        settings = {
+            "template": template_rows,
+            "prompt_version": PROMPT_VERSION,
+            "model": llm["model"],
+            "temperature": llm["temperature"],
+            "max_tokens": llm["max_tokens"],
+            "structured_output": self.structured_output,
+            **{key: runtime.get(key) for key in (
+                "chunk_field_size", "pack_field_chunks", "max_chars_per_doc", "max_input_tokens",
+                "map_reduce_long_docs", "window_tokens", "stride_tokens"
+            )}
+        }
+        return hashlib.blake2b(json_dumps(settings), digest_size=16).hexdigest()
+    
     def extract_pdf_text(self, pdf_path: str) -> str:
-        """Extract text from PDF using pdfplumber, fallback to PyPDF2"""
-        try:
-            # Try pdfplumber first
-            with pdfplumber.open(pdf_path) as pdf:
-                text = ""
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                if text.strip():
-                    return text[:self.config["runtime"]["max_chars_per_doc"]]
-        except Exception as e:
-            logger.warning(f"pdfplumber failed for {pdf_path}: {e}")
-        
-        try:
-            # Fallback to PyPDF2
-            with open(pdf_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-                return text[:self.config["runtime"]["max_chars_per_doc"]]
-        except Exception as e:
-            logger.error(f"Both PDF extractors failed for {pdf_path}: {e}")
-            return ""
+        """Extract text from PDF using pypdfium2, fallback to pdfplumber, then pypdf"""
+        return extract_pdf_text(pdf_path, self.config["runtime"]["max_chars_per_doc"])
     
-    def create_extraction_prompt(self, field_names: List[str], field_descriptions: List[str], 
-                               example1: List[str], example2: List[str], text: str) -> str:
-        """Create extraction prompt for LLM"""
-        # Create field specification
+    async def extract_pdf_text_async(self, pdf_path: str) -> str:
+        """Extract PDF text in the worker process pool without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_pool(), extract_pdf_text, pdf_path, self.config["runtime"]["max_chars_per_doc"]
+        )
+    
+    def _format_field_spec(self, field_names: List[str], field_descriptions: List[str],
+                           example1: List[str], example2: List[str]) -> str:
+        """Format one group of template fields for the prompt"""
         field_spec = []
         for i, (name, desc, ex1, ex2) in enumerate(zip(field_names, field_descriptions, example1, example2)):
             field_spec.append(f"{name}: {desc} (Examples: {ex1}, {ex2})")
+        return chr(10).join(field_spec)
+    
+    def _document_message(self, text: str) -> Dict[str, str]:
+        """Build the system message holding the document text.
+        
+        It is identical for every request on the same PDF and placed first, so
+        provider-side prompt caching can reuse the shared document prefix.
+        """
+        return {
+            "role": "system",
+            "content": f"""You extract structured data from the document below. Use only information stated in the document.
+
+DOCUMENT:
+{text}"""
+        }
+    
+    def create_extraction_prompt(self, field_names: List[str], field_descriptions: List[str], 
+                               example1: List[str], example2: List[str], text: str) -> List[Dict[str, str]]:
+        """Create extraction messages for LLM"""
+        # Create field specification
+        field_spec = self._format_field_spec(field_names, field_descriptions, example1, example2)
         
-        prompt = f"""Extract data from the following text and output ONLY a table format.
+        if self.structured_output:
+            prompt = f"""Extract data from the document.
+
+REQUIRED FIELDS:
+{field_spec}
+
+OUTPUT REQUIREMENTS:
+1. Return a JSON object whose "rows" array has one object per extracted record
+2. Each row has a Row_ID (starting from 1) and one string value per required field
+3. Use "Not reported" for missing values"""
+        else:
+            prompt = f"""Extract data from the document and output ONLY a table format.
 
 REQUIRED FIELDS:
-{chr(10).join(field_spec)}
+{field_spec}
 
 STRICT OUTPUT REQUIREMENTS:
 1. Output ONLY the table - no explanations, no JSON, no markdown headers
@@ -98,29 +608,101 @@ STRICT OUTPUT REQUIREMENTS:
 5. Use "Not reported" for missing values
 6. Each row must have the same number of columns as the header
 
-TEXT TO EXTRACT FROM:
-{text}
-
 OUTPUT (table only):"""
         
-        return prompt
+        return [self._document_message(text), {"role": "user", "content": prompt}]
     
-    def parse_table_response(self, response: str) -> Optional[pd.DataFrame]:
-        """Parse LLM response into DataFrame"""
+    def create_packed_extraction_prompt(self, field_groups: List[Tuple[List[str], List[str], List[str], List[str]]],
+                                        text: str) -> List[Dict[str, str]]:
+        """Create a single request that asks for one table per field group"""
+        group_specs = []
+        for index, group in enumerate(field_groups, start=1):
+            group_specs.append(f"FIELD GROUP {index}:\n{self._format_field_spec(*group)}")
+        
+        if self.structured_output:
+            prompt = f"""Extract data from the document for each field group below.
+
+{chr(10).join(group_specs)}
+
+OUTPUT REQUIREMENTS:
+1. Return a JSON object with one array per field group, named "group_<group number>"
+2. Each array has one object per extracted record, with a Row_ID (starting from 1) and one string value per field of that group
+3. Use the same Row_ID for the same record across groups
+4. Use "Not reported" for missing values"""
+        else:
+            prompt = f"""Extract data from the document and output ONLY table formats, one table per field group.
+
+{chr(10).join(group_specs)}
+
+STRICT OUTPUT REQUIREMENTS:
+1. For each field group, first output a line containing only {CHUNK_SENTINEL.format(index='<group number>')}, then its table
+2. Output ONLY the tables - no explanations, no JSON, no markdown headers
+3. First row of each table must be the header with that group's field names separated by tabs
+4. Include a Row_ID column (starting from 1) in every table, using the same Row_ID for the same record across tables
+5. Use tab characters (\\t) to separate columns
+6. Use "Not reported" for missing values
+7. Each row must have the same number of columns as the header
+
+OUTPUT (tables only):"""
+        
+        return [self._document_message(text), {"role": "user", "content": prompt}]
+    
+    def _response_keys(self, group_count: int) -> List[str]:
+        """JSON keys holding the rows of each field group"""
+        if group_count == 1:
+            return ["rows"]
+        return [f"group_{index}" for index in range(1, group_count + 1)]
+    
+    def create_response_format(self, field_groups: List[List[str]]) -> Dict:
+        """Build a strict JSON schema response_format for the given field groups"""
+        def row_schema(fields: List[str]) -> Dict:
+            columns = ["Row_ID"] + [field for field in fields if field != "Row_ID"]
+            return {
+                "type": "object",
+                "properties": {column: {"type": "string"} for column in columns},
+                "required": columns,
+                "additionalProperties": False
+            }
+        
+        keys = self._response_keys(len(field_groups))
+        schema = {
+            "type": "object",
+            "properties": {
+                key: {"type": "array", "items": row_schema(fields)}
+                for key, fields in zip(keys, field_groups)
+            },
+            "required": keys,
+            "additionalProperties": False
+        }
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": "extraction", "strict": True, "schema": schema}
+        }
+    
+    def parse_json_response(self, response: str, field_groups: List[List[str]]) -> List[Optional[pd.DataFrame]]:
+        """Parse a structured JSON response into one DataFrame per field group"""
         try:
-            lines = [line.strip() for line in response.strip().split('\n') if line.strip()]
-            if not lines:
-                return None
-            
-            # Try tab-separated first
-            if '\t' in lines[0]:
-                data = [line.split('\t') for line in lines]
-            else:
-                # Try space-separated or other formats
-                data = [re.split(r'\s{2,}|\|', line) for line in lines]
-                data = [[cell.strip() for cell in row if cell.strip()] for row in data]
-            
-            if not data or len(data) < 1:
+            data = json_loads(response)
+        except ValueError as e:
+            logger.warning(f"Failed to parse JSON response: {e}")
+            return [None] * len(field_groups)
+        
+        results = []
+        for key, fields in zip(self._response_keys(len(field_groups)), field_groups):
+            rows = data.get(key) if isinstance(data, dict) else None
+            if not isinstance(rows, list):
+                results.append(None)
+                continue
+            columns = ["Row_ID"] + [field for field in fields if field != "Row_ID"]
+            df = pd.DataFrame(rows, columns=columns)
+            df['Row_ID'] = df['Row_ID'].astype(str)
+            results.append(df)
+        return results
+    
+    def _table_from_rows(self, data: Optional[List[List[str]]]) -> Optional[pd.DataFrame]:
+        """Build a DataFrame from split table rows, the first row being the header"""
+        try:
+            if not data:
                 return None
             
             # Create DataFrame
@@ -140,161 +722,504 @@ OUTPUT (table only):"""
             logger.warning(f"Failed to parse table response: {e}")
             return None
     
-    def repair_response(self, original_response: str, field_names: List[str]) -> str:
-        """Attempt to repair malformed LLM response"""
-        repair_prompt = f"""The following text should be a table but has formatting issues. 
-Please convert it to a proper tab-separated table format.
-
-Required columns: Row_ID, {', '.join(field_names)}
-
-Original text:
-{original_response}
-
-Output ONLY the corrected table (tab-separated, no explanations):"""
+    def parse_table_response(self, response: str) -> Optional[pd.DataFrame]:
+        """Parse LLM response into DataFrame"""
+        parser = StreamingTableParser()
+        parser.feed(response)
+        return self._table_from_rows(parser.close().get(0))
+    
+    def tables_from_sections(self, sections: Dict[int, List[List[str]]],
+                             group_count: int) -> List[Optional[pd.DataFrame]]:
+        """Build one DataFrame per field group from parsed table sections"""
+        if group_count == 1:
+            return [self._table_from_rows(sections.get(0) or sections.get(1))]
+        return [self._table_from_rows(sections.get(index)) for index in range(1, group_count + 1)]
+    
+    def _request_body(self, messages: List[Dict], field_groups: List[List[str]]) -> Dict:
+        """Build the chat completion request parameters"""
+        body = {
+            "model": self.config["llm"]["model"],
+            "messages": messages,
+            "temperature": self.config["llm"]["temperature"],
+            "max_tokens": self.config["llm"]["max_tokens"]
+        }
+        if self.structured_output:
+            body["response_format"] = self.create_response_format(field_groups)
+        return body
+    
+    def _estimate_tokens(self, body: Dict, document_tokens: int) -> int:
+        """Token cost of a request as counted against the TPM limit.
         
-        try:
-            response = self.client.chat.completions.create(
-                model=self.config["llm"]["model"],
-                messages=[{"role": "user", "content": repair_prompt}],
-                temperature=self.config["llm"]["temperature"],
-                max_tokens=self.config["llm"]["max_tokens"]
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            logger.error(f"Repair call failed: {e}")
-            return original_response
+        The leading document message is counted from document_tokens, taken
+        when the document was truncated or windowed; only the short
+        instruction messages are encoded here.
+        """
+        prompt_tokens = sum(self._count_tokens(message["content"]) for message in body["messages"][1:])
+        return document_tokens + prompt_tokens + body["max_tokens"]
     
-    def extract_from_pdf(self, pdf_path: str, field_names: List[str], 
-                        field_descriptions: List[str], example1: List[str], 
-                        example2: List[str]) -> pd.DataFrame:
-        """Extract data from a single PDF"""
-        logger.info(f"Processing: {os.path.basename(pdf_path)}")
+    async def _read_stream(self, stream) -> Tuple[str, Optional[Dict[int, List[List[str]]]]]:
+        """Collect a streamed completion, splitting table rows while tokens arrive"""
+        parser = None if self.structured_output else StreamingTableParser()
+        parts = []
+        async for event in stream:
+            if not event.choices:
+                continue
+            delta = event.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                if parser is not None:
+                    parser.feed(delta)
+        return "".join(parts), parser.close() if parser is not None else None
+    
+    async def _chat_completion(self, messages: List[Dict], field_groups: List[List[str]],
+                               document_tokens: int) -> Tuple[str, Optional[Dict[int, List[List[str]]]]]:
+        """Send one chat completion request, bounded by max_concurrency and rate limits.
         
-        # Extract text
-        text = self.extract_pdf_text(pdf_path)
-        if not text:
-            logger.warning(f"No text extracted from {pdf_path}")
-            return pd.DataFrame()
+        Returns the response text and, for streamed table output, its already
+        parsed table sections.
+        """
+        if self._llm_semaphore is None:
+            self._llm_semaphore = asyncio.Semaphore(self.config["llm"].get("max_concurrency", 8))
+        body = self._request_body(messages, field_groups)
+        stream = self.config["llm"].get("stream", True)
+        max_retries = self.config["llm"].get("max_retries", 5)
+        
+        async with self._llm_semaphore:
+            for attempt in range(max_retries + 1):
+                await self.rate_limiter.acquire(self._estimate_tokens(body, document_tokens))
+                try:
+                    raw = await self.aclient.chat.completions.with_raw_response.create(**body, stream=stream)
+                except (RateLimitError, APIConnectionError, InternalServerError) as e:
+                    # Also covers the transient errors the SDK's own retries used to absorb
+                    if attempt == max_retries:
+                        raise
+                    delay = min(2 ** attempt, 60)
+                    reason = "Rate limited" if isinstance(e, RateLimitError) else f"Request failed ({e})"
+                    logger.warning(f"{reason}, retrying in {delay}s")
+                    await asyncio.sleep(delay)
+                    continue
+                self.rate_limiter.update_from_headers(raw.headers)
+                if stream:
+                    return await self._read_stream(raw.parse())
+                return raw.parse().choices[0].message.content, None
+    
+    def _build_chunk_prompts(self, field_names: List[str], field_descriptions: List[str],
+                             example1: List[str], example2: List[str],
+                             text: str) -> List[Tuple[int, List[Dict[str, str]], List[List[str]]]]:
+        """Split the template fields into chunks and build the LLM requests for them.
         
-        # Process in chunks if too many fields
+        Returns (request_index, messages, field_groups) tuples. With pack_field_chunks
+        enabled all chunks share a single request, so the document is sent only once.
+        """
         chunk_size = self.config["runtime"]["chunk_field_size"]
-        all_results = []
+        chunks = []
         
         for i in range(0, len(field_names), chunk_size):
             chunk_fields = field_names[i:i+chunk_size]
             chunk_descriptions = field_descriptions[i:i+chunk_size]
             chunk_ex1 = example1[i:i+chunk_size]
             chunk_ex2 = example2[i:i+chunk_size]
-            
-            # Create prompt
-            prompt = self.create_extraction_prompt(chunk_fields, chunk_descriptions, 
-                                                 chunk_ex1, chunk_ex2, text)
-            
-            # Call LLM
-            try:
-                response = self.client.chat.completions.create(
-                    model=self.config["llm"]["model"],
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=self.config["llm"]["temperature"],
-                    max_tokens=self.config["llm"]["max_tokens"]
-                )
-                
-                raw_response = response.choices[0].message.content.strip()
-                
-                # Save debug info
+            chunks.append((chunk_fields, chunk_descriptions, chunk_ex1, chunk_ex2))
+        
+        if len(chunks) > 1 and self.config["runtime"].get("pack_field_chunks", True):
+            messages = self.create_packed_extraction_prompt(chunks, text)
+            return [(0, messages, [chunk[0] for chunk in chunks])]
+        
+        # Create one prompt per chunk
+        return [
+            (index, self.create_extraction_prompt(*chunk, text), [chunk[0]])
+            for index, chunk in enumerate(chunks)
+        ]
+    
+    def _build_document_requests(self, field_names: List[str], field_descriptions: List[str],
+                                 example1: List[str], example2: List[str],
+                                 text: str) -> List[Tuple[str, int, List[Dict[str, str]], List[List[str]], int]]:
+        """Build (request_label, window_index, messages, field_groups, document_tokens) for every window of a document"""
+        windows = self.document_windows(text)
+        requests = []
+        for window_index, (window_text, document_tokens) in enumerate(windows):
+            for request_index, messages, field_groups in self._build_chunk_prompts(
+                    field_names, field_descriptions, example1, example2, window_text):
+                label = str(request_index) if len(windows) == 1 else f"w{window_index}-{request_index}"
+                requests.append((label, window_index, messages, field_groups, document_tokens))
+        return requests
+    
+    def _combine_document_results(self, pdf_path: str,
+                                  window_results: List[Tuple[int, List[pd.DataFrame]]]) -> pd.DataFrame:
+        """Merge chunk tables within each text window, then reduce windows by dropping duplicate rows"""
+        by_window = {}
+        for window_index, dfs in window_results:
+            by_window.setdefault(window_index, []).extend(dfs)
+        
+        window_frames = [
+            self._merge_chunk_results(pdf_path, by_window[window_index])
+            for window_index in sorted(by_window)
+        ]
+        window_frames = [df for df in window_frames if not df.empty]
+        if not window_frames:
+            return pd.DataFrame()
+        if len(window_frames) == 1:
+            return window_frames[0]
+        return pd.concat(window_frames, ignore_index=True).drop_duplicates().reset_index(drop=True)
+    
+    async def _write_debug(self, record: Dict):
+        """Append one record to the run's JSONL debug log"""
+        if not self.debug:
+            return
+        if self._debug_lock is None:
+            self._debug_lock = asyncio.Lock()
+        async with self._debug_lock:
+            if self._debug_handle is None:
                 debug_file = os.path.join(
-                    self.config["runtime"]["debug_dir"], 
-                    f"{os.path.basename(pdf_path)}_chunk_{i//chunk_size}.txt"
+                    self.config["runtime"]["debug_dir"],
+                    f"debug_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
                 )
-                with open(debug_file, 'w', encoding='utf-8') as f:
-                    f.write(f"PROMPT:\n{prompt}\n\nRESPONSE:\n{raw_response}")
-                
-                # Parse response
-                df = self.parse_table_response(raw_response)
-                
-                # Try repair if parsing failed
-                if df is None and self.config["runtime"]["use_repair_call"]:
-                    logger.warning(f"Parsing failed, attempting repair for chunk {i//chunk_size}")
-                    repaired_response = self.repair_response(raw_response, chunk_fields)
-                    df = self.parse_table_response(repaired_response)
-                    
-                    # Save repaired version
-                    with open(debug_file.replace('.txt', '_repaired.txt'), 'w', encoding='utf-8') as f:
-                        f.write(f"ORIGINAL:\n{raw_response}\n\nREPAIRED:\n{repaired_response}")
-                
-                if df is not None:
-                    all_results.append(df)
-                else:
-                    logger.error(f"Failed to parse response for chunk {i//chunk_size}")
-                    
-            except Exception as e:
-                logger.error(f"LLM call failed for chunk {i//chunk_size}: {e}")
-        
-        # Merge results horizontally by Row_ID
-        if all_results:
-            final_df = all_results[0]
-            for df in all_results[1:]:
-                if 'Row_ID' in df.columns and 'Row_ID' in final_df.columns:
-                    final_df = pd.merge(final_df, df, on='Row_ID', how='outer')
-                else:
-                    # Fallback: concatenate horizontally
-                    final_df = pd.concat([final_df, df], axis=1)
-            
-            # Add filename and clean up
-            final_df['File_Name'] = os.path.basename(pdf_path)
-            if 'Row_ID' in final_df.columns:
-                final_df = final_df.drop('Row_ID', axis=1)
-            
-            # Reorder columns: File_Name first, then template fields
-            cols = ['File_Name'] + [col for col in final_df.columns if col != 'File_Name']
-            final_df = final_df[cols]
-            
-            return final_df
+                self._debug_handle = open(debug_file, 'ab')
+            self._debug_handle.write(json_dumps(record) + b"\n")
+    
+    async def _handle_chunk_response(self, pdf_path: str, request_label: str, messages: List[Dict[str, str]],
+                                     field_groups: List[List[str]], raw_response: str,
+                                     table_sections: Optional[Dict[int, List[List[str]]]] = None) -> List[pd.DataFrame]:
+        """Log a response when debugging and parse the table of each field group"""
+        # Save debug info
+        await self._write_debug({
+            "file": os.path.basename(pdf_path),
+            "chunk": request_label,
+            "messages": messages,
+            "response": raw_response
+        })
+        
+        if self.structured_output:
+            parsed = self.parse_json_response(raw_response, field_groups)
+        else:
+            if table_sections is None:
+                parser = StreamingTableParser()
+                parser.feed(raw_response)
+                table_sections = parser.close()
+            parsed = self.tables_from_sections(table_sections, len(field_groups))
         
-        return pd.DataFrame()
+        results = []
+        for group_index, df in enumerate(parsed):
+            if df is None:
+                label = request_label if len(field_groups) == 1 else f"{request_label}.{group_index}"
+                logger.error(f"Failed to parse response for chunk {label}")
+            else:
+                results.append(df)
+        return results
     
-    def run_extraction(self):
-        """Main extraction workflow"""
-        logger.info("Starting template-based extraction...")
+    async def _extract_chunk(self, pdf_path: str, request_label: str, messages: List[Dict[str, str]],
+                             field_groups: List[List[str]], document_tokens: int) -> List[pd.DataFrame]:
+        """Run one request through the LLM and parse the returned table(s)"""
+        try:
+            raw_response, table_sections = await self._chat_completion(messages, field_groups, document_tokens)
+            return await self._handle_chunk_response(pdf_path, request_label, messages,
+                                                     field_groups, raw_response.strip(), table_sections)
+        except Exception as e:
+            logger.error(f"LLM call failed for chunk {request_label}: {e}")
+            return []
+    
+    def _merge_chunk_results(self, pdf_path: str, all_results: List[pd.DataFrame]) -> pd.DataFrame:
+        """Merge per-chunk tables for one PDF into a single result table"""
+        if not all_results:
+            return pd.DataFrame()
         
-        # Load template
-        field_names, field_descriptions, example1, example2 = self.load_template(
-            self.config["paths"]["template_xlsx"]
-        )
+        # Merge results horizontally by Row_ID in a single concat
+        indexed = [df.set_index('Row_ID') for df in all_results if 'Row_ID' in df.columns]
+        if len(indexed) == len(all_results) and all(df.index.is_unique for df in indexed):
+            final_df = pd.concat(indexed, axis=1, join='outer').reset_index(drop=True)
+        else:
+            # Fallback: concatenate horizontally by position
+            final_df = pd.concat([df.reset_index(drop=True) for df in all_results], axis=1)
         
-        # Get PDF files
-        pdf_folder = Path(self.config["paths"]["pdf_folder"])
-        pdf_files = list(pdf_folder.glob("*.pdf"))
+        # Add filename and clean up
+        final_df['File_Name'] = os.path.basename(pdf_path)
+        if 'Row_ID' in final_df.columns:
+            final_df = final_df.drop('Row_ID', axis=1)
         
-        if not pdf_files:
-            logger.error(f"No PDF files found in {pdf_folder}")
-            return
+        # Reorder columns: File_Name first, then template fields
+        cols = ['File_Name'] + [col for col in final_df.columns if col != 'File_Name']
+        return final_df[cols]
+    
+    def group_duplicate_pdfs(self, pdf_files: List[Path]) -> List[List[Path]]:
+        """Group PDFs with identical content; the first file of each group is extracted"""
+        groups = defaultdict(list)
+        for pdf_file in pdf_files:
+            groups[self._pdf_digest(pdf_file)].append(pdf_file)
+        return list(groups.values())
+    
+    def _pdf_digest(self, pdf_path) -> bytes:
+        """blake2b digest of a PDF's content, read and hashed once per file"""
+        digest = self._pdf_digests.get(str(pdf_path))
+        if digest is None:
+            with open(pdf_path, 'rb') as file:
+                digest = hashlib.blake2b(file.read(), digest_size=16).digest()
+            self._pdf_digests[str(pdf_path)] = digest
+        return digest
+    
+    def _replicate_duplicates(self, result_df: pd.DataFrame,
+                              duplicates: Dict[str, List[Path]]) -> pd.DataFrame:
+        """Copy a representative PDF's rows to every duplicate in its group"""
+        if result_df.empty:
+            return result_df
+        group = duplicates.get(result_df['File_Name'].iloc[0])
+        if not group:
+            return result_df
+        return pd.concat([result_df.assign(File_Name=pdf_file.name) for pdf_file in group],
+                         ignore_index=True)
+    
+    def _cache_key(self, pdf_path: str) -> str:
+        """Build the result cache key from the PDF content digest and the extraction settings digest"""
+        return f"{self._pdf_digest(pdf_path).hex()}:{self._extraction_digest}"
+    
+    def _get_cached_result(self, pdf_path: str) -> Tuple[Optional[str], Optional[pd.DataFrame]]:
+        """Return (cache_key, cached result) for a PDF; both None when caching is off"""
+        if self.cache is None:
+            return None, None
+        cache_key = self._cache_key(pdf_path)
+        cached_df = self.cache.get(cache_key)
+        if cached_df is not None:
+            logger.info(f"Using cached result for: {os.path.basename(pdf_path)}")
+            cached_df = cached_df.copy()
+            cached_df['File_Name'] = os.path.basename(pdf_path)
+        return cache_key, cached_df
+    
+    async def extract_from_pdf(self, pdf_path: str, field_names: List[str], 
+                               field_descriptions: List[str], example1: List[str], 
+                               example2: List[str]) -> pd.DataFrame:
+        """Extract data from a single PDF"""
+        cache_key, cached_df = self._get_cached_result(pdf_path)
+        if cached_df is not None:
+            return cached_df
+        
+        logger.info(f"Processing: {os.path.basename(pdf_path)}")
+        
+        # Extract text
+        text = await self.extract_pdf_text_async(pdf_path)
+        if not text:
+            logger.warning(f"No text extracted from {pdf_path}")
+            return pd.DataFrame()
+        
+        # Process in chunks if too many fields (and per text window for long
+        # documents); all requests run concurrently
+        requests = self._build_document_requests(field_names, field_descriptions,
+                                                 example1, example2, text)
+        chunk_results = await asyncio.gather(*[
+            self._extract_chunk(pdf_path, request_label, messages, field_groups, document_tokens)
+            for request_label, _, messages, field_groups, document_tokens in requests
+        ])
+        
+        final_df = self._combine_document_results(pdf_path, [
+            (window_index, dfs) for (_, window_index, _, _, _), dfs in zip(requests, chunk_results)
+        ])
+        if cache_key is not None and not final_df.empty:
+            self.cache.set(cache_key, final_df)
+        return final_df
+    
+    async def _extract_pdf_safely(self, pdf_file: Path, field_names: List[str],
+                                  field_descriptions: List[str], example1: List[str],
+                                  example2: List[str]) -> pd.DataFrame:
+        """Extract a single PDF, logging instead of raising on failure"""
+        try:
+            return await self.extract_from_pdf(
+                str(pdf_file), field_names, field_descriptions, example1, example2
+            )
+        except Exception as e:
+            logger.error(f"Error processing {pdf_file}: {e}")
+            return pd.DataFrame()
+    
+    async def run_extraction_batch(self, pdf_files: List[Path], field_names: List[str],
+                                   field_descriptions: List[str], example1: List[str],
+                                   example2: List[str]) -> List[pd.DataFrame]:
+        """Submit every PDF x chunk prompt as one OpenAI Batch API job and parse the output"""
+        llm_config = self.config["llm"]
+        
+        # Serialize all prompts into a JSONL batch input
+        requests = {}
+        lines = []
+        cached_results = []
+        cache_keys = {}
+        for pdf_file in pdf_files:
+            cache_key, cached_df = self._get_cached_result(str(pdf_file))
+            if cached_df is not None:
+                cached_results.append(cached_df)
+            else:
+                cache_keys[str(pdf_file)] = cache_key
+        
+        # Extract all remaining PDFs in parallel
+        pending_files = [pdf_file for pdf_file in pdf_files if str(pdf_file) in cache_keys]
+        texts = await asyncio.gather(*[
+            self.extract_pdf_text_async(str(pdf_file)) for pdf_file in pending_files
+        ])
+        
+        for pdf_index, (pdf_file, text) in enumerate(zip(pending_files, texts)):
+            if not text:
+                logger.warning(f"No text extracted from {pdf_file}")
+                continue
+            for request_label, window_index, messages, field_groups, _ in self._build_document_requests(
+                    field_names, field_descriptions, example1, example2, text):
+                custom_id = f"{pdf_index}:{request_label}"
+                requests[custom_id] = (str(pdf_file), request_label, window_index, messages, field_groups)
+                lines.append(json_dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self._request_body(messages, field_groups)
+                }))
         
-        logger.info(f"Found {len(pdf_files)} PDF files to process")
+        if not requests:
+            return cached_results
         
-        # Process each PDF
-        all_results = []
-        for pdf_file in tqdm(pdf_files, desc="Processing PDFs"):
+        # Batch file and job calls bypass the token bucket, so let the SDK retry them
+        batch_client = self.aclient.with_options(max_retries=llm_config.get("max_retries", 5))
+        
+        # Upload input and submit the batch job
+        batch_input = await batch_client.files.create(
+            file=("batch_input.jsonl", b"\n".join(lines)),
+            purpose="batch"
+        )
+        batch = await batch_client.batches.create(
+            input_file_id=batch_input.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info(f"Submitted batch {batch.id} with {len(requests)} requests")
+        
+        # Poll until the batch reaches a terminal state
+        poll_interval = llm_config.get("batch_poll_interval", 30)
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(poll_interval)
+            batch = await batch_client.batches.retrieve(batch.id)
+            logger.info(f"Batch {batch.id} status: {batch.status}")
+        
+        if batch.status != "completed" or not batch.output_file_id:
+            logger.error(f"Batch {batch.id} finished with status {batch.status}")
+            return cached_results
+        
+        # Dispatch each output line to the table parser by custom_id
+        output = await batch_client.files.content(batch.output_file_id)
+        chunk_results = {}
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
             try:
-                result_df = self.extract_from_pdf(
-                    str(pdf_file), field_names, field_descriptions, example1, example2
-                )
-                if not result_df.empty:
-                    all_results.append(result_df)
-            except Exception as e:
-                logger.error(f"Error processing {pdf_file}: {e}")
-        
-        # Combine all results
-        if all_results:
-            final_df = pd.concat(all_results, ignore_index=True)
+                item = json_loads(line)
+            except ValueError as e:
+                logger.error(f"Skipping unreadable batch output line: {e}")
+                continue
+            custom_id = item.get("custom_id")
+            if custom_id not in requests:
+                continue
+            pdf_path, request_label, window_index, messages, field_groups = requests[custom_id]
+            response = item.get("response") or {}
+            if item.get("error") or response.get("status_code") != 200:
+                logger.error(f"Batch request failed for {os.path.basename(pdf_path)} "
+                             f"chunk {request_label}: {item.get('error') or response.get('status_code')}")
+                continue
+            try:
+                content = response["body"]["choices"][0]["message"]["content"]
+            except (KeyError, IndexError, TypeError):
+                content = None
+            if content is None:
+                # Refusals and truncated responses carry no content; fail only this item
+                logger.error(f"Batch request returned no content for {os.path.basename(pdf_path)} "
+                             f"chunk {request_label}")
+                continue
+            raw_response = content.strip()
+            dfs = await self._handle_chunk_response(pdf_path, request_label, messages,
+                                                    field_groups, raw_response)
+            chunk_results.setdefault(pdf_path, {})[custom_id] = (window_index, dfs)
+        
+        all_results = cached_results
+        for pdf_path, results in chunk_results.items():
+            # Restore submission order so chunk columns merge in template order
+            ordered = [results[custom_id] for custom_id in requests if custom_id in results]
+            final_df = self._combine_document_results(pdf_path, ordered)
+            if cache_keys.get(pdf_path) is not None and not final_df.empty:
+                self.cache.set(cache_keys[pdf_path], final_df)
+            all_results.append(final_df)
+        return all_results
+    
+    async def _warm_up_connection(self):
+        """Open the HTTPS connection to the LLM endpoint ahead of the first request"""
+        try:
+            await self.aclient.models.list()
+        except Exception as e:
+            logger.debug(f"LLM connection warmup failed: {e}")
+    
+    async def run_extraction_async(self):
+        """Main extraction workflow; all PDF x chunk requests are dispatched concurrently"""
+        logger.info("Starting template-based extraction...")
+        pdf_folder = Path(self.config["paths"]["pdf_folder"])
+        if self.aclient.is_closed():
+            self.aclient = self._build_client()
+        
+        writer = None
+        try:
+            # Load template and get PDF files while the LLM connection warms up
+            template, pdf_files, _ = await asyncio.gather(
+                asyncio.to_thread(self.load_template, self.config["paths"]["template_xlsx"]),
+                asyncio.to_thread(lambda: list(pdf_folder.glob("*.pdf"))),
+                self._warm_up_connection()
+            )
+            field_names, field_descriptions, example1, example2 = template
             
-            # Save to Excel
-            output_path = self.config["paths"]["output_xlsx"]
-            final_df.to_excel(output_path, sheet_name='Results', index=False)
-            logger.info(f"Results saved to: {output_path}")
-            logger.info(f"Total records extracted: {len(final_df)}")
-        else:
-            logger.warning("No data extracted from any PDF files")
+            if not pdf_files:
+                logger.error(f"No PDF files found in {pdf_folder}")
+                return
+            
+            logger.info(f"Found {len(pdf_files)} PDF files to process")
+            
+            # Extract each distinct PDF once; duplicates reuse its rows
+            groups = await asyncio.to_thread(self.group_duplicate_pdfs, pdf_files)
+            unique_files = [group[0] for group in groups]
+            if len(unique_files) < len(pdf_files):
+                logger.info(f"Skipping {len(pdf_files) - len(unique_files)} duplicate PDF files")
+            duplicates = {group[0].name: group for group in groups if len(group) > 1}
+            
+            # Results are appended to the output as each PDF completes
+            writer = ResultWriter(
+                self.config["paths"]["output_xlsx"],
+                ['File_Name'] + field_names,
+                self.config["runtime"].get("emit_xlsx", True),
+                file_order=[pdf_file.name for group in groups for pdf_file in group]
+            )
+            
+            if self.config["llm"].get("use_batch_api", False):
+                # Offline Batch API job: half the cost, separate rate-limit pool
+                results = await self.run_extraction_batch(
+                    unique_files, field_names, field_descriptions, example1, example2
+                )
+                for result_df in results:
+                    writer.write(self._replicate_duplicates(result_df, duplicates))
+            else:
+                # Process all PDFs concurrently
+                tasks = [
+                    self._extract_pdf_safely(pdf_file, field_names, field_descriptions, example1, example2)
+                    for pdf_file in unique_files
+                ]
+                for next_result in tqdm.as_completed(tasks, desc="Processing PDFs"):
+                    writer.write(self._replicate_duplicates(await next_result, duplicates))
+        finally:
+            await self.aclient.close()
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
+            if self._debug_handle is not None:
+                self._debug_handle.close()
+                self._debug_handle = None
+            # Event-loop primitives are recreated in the next run's loop
+            self._llm_semaphore = None
+            self._debug_lock = None
+            if self.cache is not None:
+                self.cache.close()
+            if writer is not None:
+                writer.close()
+        
+        writer.write_excel()
+    
+    def run_extraction(self):
+        """Synchronous entry point for the extraction workflow"""
+        asyncio.run(self.run_extraction_async())
 
 def main():
     """Main entry point"""
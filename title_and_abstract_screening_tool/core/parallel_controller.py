@@ -7,14 +7,43 @@
 import os
 import sys
 import json
+import re
+import mmap
 import time
+import functools
+import atexit
+import queue
+import logging
+from logging.handlers import QueueHandler, QueueListener
 import psutil
 import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 import traceback
 import shutil
 import threading
+import copy
+from collections import Counter
+from types import MappingProxyType
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import quoteattr
+
+try:
+    import lxml.etree as LET
+except ImportError:
+    LET = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 标准库回退时优先使用defusedxml：禁止实体展开与外部引用
+try:
+    from defusedxml.ElementTree import iterparse as _safe_iterparse
+except ImportError:
+    _safe_iterparse = ET.iterparse
 
 # 添加项目路径
 project_root = os.path.dirname(os.path.dirname(__file__))
@@ -32,19 +61,212 @@ try:
     from i18n.i18n_manager import get_message
     I18N_AVAILABLE = True
 except ImportError:
+    get_message = None
     I18N_AVAILABLE = False
     print("Warning: i18n module not available, using fallback messages")
 
+# i18n是否可用在导入时即已确定
+_GET_MESSAGE = get_message if I18N_AVAILABLE else None
+
+def iter_xml_records(xml_path):
+    """
+    流式逐条产出 (根元素, <record>元素)
+    
+    优先使用lxml（标签过滤在libxml2中完成，只对record回调），否则回退到标准库。
+    每条记录在调用方处理完后即被释放，内存占用与文件大小无关。
+    两种解析方式均不展开外部实体、不访问网络。
+    """
+    if LET is not None:
+        for _, elem in LET.iterparse(xml_path, events=('end',), tag='record',
+                                     huge_tree=True, remove_blank_text=True,
+                                     resolve_entities=False, no_network=True):
+            yield elem.getroottree().getroot(), elem
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+        return
+    
+    root = None
+    parents = []
+    for event, elem in _safe_iterparse(xml_path, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            parents.append(elem)
+            continue
+        parents.pop()
+        if elem.tag == 'record':
+            yield root, elem
+            if parents:
+                parents[-1].remove(elem)
+
+def _json_bytes(obj):
+    """序列化为缩进格式的UTF-8 JSON字节（orjson可用时优先使用）"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+def write_json_file(path, obj):
+    """写入缩进格式的JSON文件（一次性写入字节）"""
+    with open(path, 'wb') as f:
+        f.write(_json_bytes(obj))
+
+def _atomic_write_json(path, obj):
+    """
+    持久化写入JSON文件：先写临时文件并fsync，再原子替换
+    
+    进程在写入过程中被终止时，文件要么是旧内容要么是新内容，不会残缺
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_json_bytes(obj))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    
+    # POSIX下同步目录项，确保重命名本身落盘（Windows不支持，忽略）
+    try:
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+# <record>起止标签（不匹配<records>，包括自闭合的<record/>）
+_RECORD_OPEN_RE = re.compile(rb'<record(?:[\s>]|/>)')
+_RECORD_CLOSE = b'</record>'
+# 字节扫描无法正确处理的构造：其中可能出现字面的<record>或</record>
+_UNSCANNABLE_MARKERS = (b'<![CDATA[', b'<!--')
+
+def can_index_xml_records(data):
+    """文件不含CDATA段和注释时，才能用字节扫描定位记录"""
+    return all(data.find(marker) < 0 for marker in _UNSCANNABLE_MARKERS)
+
+def index_xml_records(data):
+    """
+    在原始字节中定位每条<record>，返回 [(起始偏移, 结束偏移), ...]
+    
+    只做字节扫描，不构建XML对象，也不解码记录内容；
+    调用前需用can_index_xml_records确认文件中没有CDATA段和注释
+    """
+    spans = []
+    position = 0
+    while True:
+        match = _RECORD_OPEN_RE.search(data, position)
+        if match is None:
+            break
+        tag_end = data.find(b'>', match.start())
+        if data[tag_end - 1:tag_end] == b'/':
+            # 自闭合的<record/>或<record .../>
+            end = tag_end + 1
+        else:
+            end = data.find(_RECORD_CLOSE, match.end())
+            if end < 0:
+                raise ValueError(f"Unclosed <record> element at byte {match.start()}")
+            end += len(_RECORD_CLOSE)
+        spans.append((match.start(), end))
+        position = end
+    return spans
+
+def element_to_bytes(elem):
+    """序列化单个元素（不含尾随文本）"""
+    if LET is not None and isinstance(elem, LET._Element):
+        return LET.tostring(elem, encoding='utf-8', with_tail=False)
+    elem.tail = None
+    return ET.tostring(elem, encoding='utf-8')
+
 # 简化的XMLSplitter类（避免导入问题）
 class XMLSplitter:
     def count_records(self, xml_path):
-        import xml.etree.ElementTree as ET
-        tree = ET.parse(xml_path)
-        root = tree.getroot()
-        records = root.findall('.//record')
-        return len(records)
+        return sum(1 for _ in iter_xml_records(xml_path))
+
+from src.utils import load_config, validate_config, create_output_directory, check_file_exists
+from src.extractor import SystematicReviewExtractor
+from progress_monitor import ProgressMonitor
+from result_merger import ResultMerger
+from state_store import (append_batch_events, load_state, load_state_cached,
+                         make_batch_event, reset_batch_events, state_file_lock)
+
+# 批次进度消息先进入队列，由单独的监听线程统一写到标准输出，
+# 收集结果的主线程不必与进度监控线程争用stdout
+_log_queue = queue.Queue(-1)
+logger = logging.getLogger(__name__)
+logger.addHandler(QueueHandler(_log_queue))
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+
+def _start_log_listener():
+    """启动批次进度消息的输出线程（stop()时会先写完队列中剩余的消息）"""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    listener = QueueListener(_log_queue, handler)
+    listener.start()
+    return listener
+
+# 回退消息映射（英文），模块级只读常量
+FALLBACK_MESSAGES = MappingProxyType({
+    "config_loaded": "✓ Configuration file loaded successfully",
+    "temp_prepared": "✓ Temporary directory prepared: {temp_dir}",
+    "system_detection": "🖥️  System Resource Detection",
+    "cpu_cores": "CPU Cores: {cores}",
+    "total_memory": "Total Memory: {memory:.1f}GB",
+    "available_memory": "Available Memory: {memory:.1f}GB",
+    "available_disk": "Available Disk Space: {space:.1f}GB",
+    "recommended_screeners": "Recommended Screeners: {count}",
+    "max_safe_screeners": "Max Safe Screeners: {count}",
+    "config_warning": "⚠️  Configuration Warning:",
+    "suggestion": "💡 Suggestion:",
+    "adjust_to_recommended": "Adjust to recommended configuration ({count} screeners)? [y/N]: ",
+    "adjusted_to": "✓ Adjusted to {count} screeners",
+    "continue_anyway": "Continue with current configuration anyway? [y/N]: ",
+    "execution_cancelled": "Execution cancelled",
+    "exceed_cpu_cores": "Requested screeners ({requested}) exceed safe CPU cores ({safe})",
+    "recommend_cpu_screeners": "Recommend setting to {count} screeners (based on CPU cores)",
+    "exceed_memory": "Estimated memory usage ({estimated:.1f}GB) may exceed available memory ({available:.1f}GB)",
+    "recommend_memory_screeners": "Based on memory limit, recommend setting to {count} screeners",
+    "insufficient_disk": "Disk space less than 2GB, may affect temporary file storage",
+    "debug_screener_count": "🔍 Debug: Using {count} screeners (from configuration file)",
+    "screener_modified_warning": "⚠️  Warning: Screener count was unexpectedly modified!",
+    "screener_reset_success": "✓ Reset to configuration value: {count}",
+    "reload_state_file": "📋 Reloading state file: {file}",
+    "state_file_not_exist": "⚠️  State file does not exist, using passed state",
+    "cannot_get_state": "Unable to get state information",
+    "batch_status_stats": "📊 Batch status: {completed}/{total} completed",
+    "temp_cleanup_success": "✓ Temporary files cleaned",
+    "temp_cleanup_error": "⚠️  Error cleaning temporary files: {error}",
+    "parallel_screening_system": "🎯 SmartEBM Parallel Screening System",
+    "parallel_screening_completed": "✅ Parallel screening completed",
+    "parallel_screening_failed": "❌ Parallel screening failed",
+    "user_interrupted": "⚠️  User interrupted operation",
+    "detected_incomplete_task": "🔄 Detected incomplete screening task",
+    "task_id": "Task ID: {id}",
+    "total_records_label": "Total Records: {count}",
+    "screener_count_label": "Screener Count: {count}",
+    "current_progress": "Current Progress: {completed}/{total} ({percent:.1f}%)",
+    "pending_batches_label": "Pending Batches:",
+    "options_label": "Options:",
+    "auto_continue_batches": "1. Auto continue incomplete batches",
+    "restart_all_tasks": "2. Restart all tasks",
+    "cancel_operation": "3. Cancel",
+    "please_select_option": "Please select [1/2/3]: ",
+    "please_enter_valid_option": "Please enter a valid option (1/2/3)",
+    "auto_continue_selected": "✓ Auto continue incomplete tasks",
+    "restart_selected": "✓ Restart tasks",
+    "cancelled_selected": "Cancelled",
+    "startup_failed": "❌ Startup failed: {error}",
+    "new_task_startup_failed": "❌ New task startup failed: {error}",
+    "parallel_execution_starting": "🔄 Starting parallel screening execution...",
+    "parallel_execution_failed": "❌ Parallel screening execution failed: {error}",
+    "resume_screening_failed": "❌ Resume screening failed: {error}",
+    "execution_cancelled_user": "Execution cancelled",
+    "starting_new_parallel": "🚀 Starting parallel screening system"
+})
 
-from src.utils import load_config
 
 # 国际化消息处理函数（优先使用i18n系统）
 def get_message_fallback(key, **kwargs):
@@ -52,79 +274,13 @@ def get_message_fallback(key, **kwargs):
     获取本地化消息
     优先使用i18n系统，如果不可用则使用回退消息
     """
-    if I18N_AVAILABLE:
+    if _GET_MESSAGE is not None:
         try:
-            # 使用hasattr和globals安全检查函数是否存在
-            import sys
-            current_module = sys.modules[__name__]
-            if hasattr(current_module, 'get_message') and callable(getattr(current_module, 'get_message', None)):
-                return current_module.get_message(key, **kwargs)
+            return _GET_MESSAGE(key, **kwargs)
         except Exception:
             pass
     
-    # 回退消息映射（英文）
-    fallback_messages = {
-        "config_loaded": "✓ Configuration file loaded successfully",
-        "temp_prepared": "✓ Temporary directory prepared: {temp_dir}",
-        "system_detection": "🖥️  System Resource Detection",
-        "cpu_cores": "CPU Cores: {cores}",
-        "total_memory": "Total Memory: {memory:.1f}GB",
-        "available_memory": "Available Memory: {memory:.1f}GB",
-        "available_disk": "Available Disk Space: {space:.1f}GB",
-        "recommended_screeners": "Recommended Screeners: {count}",
-        "max_safe_screeners": "Max Safe Screeners: {count}",
-        "config_warning": "⚠️  Configuration Warning:",
-        "suggestion": "💡 Suggestion:",
-        "adjust_to_recommended": "Adjust to recommended configuration ({count} screeners)? [y/N]: ",
-        "adjusted_to": "✓ Adjusted to {count} screeners",
-        "continue_anyway": "Continue with current configuration anyway? [y/N]: ",
-        "execution_cancelled": "Execution cancelled",
-        "exceed_cpu_cores": "Requested screeners ({requested}) exceed safe CPU cores ({safe})",
-        "recommend_cpu_screeners": "Recommend setting to {count} screeners (based on CPU cores)",
-        "exceed_memory": "Estimated memory usage ({estimated:.1f}GB) may exceed available memory ({available:.1f}GB)",
-        "recommend_memory_screeners": "Based on memory limit, recommend setting to {count} screeners",
-        "insufficient_disk": "Disk space less than 2GB, may affect temporary file storage",
-        "debug_screener_count": "🔍 Debug: Using {count} screeners (from configuration file)",
-        "screener_modified_warning": "⚠️  Warning: Screener count was unexpectedly modified!",
-        "screener_reset_success": "✓ Reset to configuration value: {count}",
-        "all_batches_completed_status": "✅ All batches processing completed",
-        "wait_process_error": "⚠️  Error waiting for processes to complete: {error}",
-        "reload_state_file": "📋 Reloading state file: {file}",
-        "state_file_not_exist": "⚠️  State file does not exist, using passed state",
-        "cannot_get_state": "Unable to get state information",
-        "batch_status_stats": "📊 Batch status: {completed}/{total} completed",
-        "save_state_failed": "⚠️  Failed to save state: {error}",
-        "temp_cleanup_success": "✓ Temporary files cleaned",
-        "temp_cleanup_error": "⚠️  Error cleaning temporary files: {error}",
-        "parallel_screening_system": "🎯 SmartEBM Parallel Screening System",
-        "parallel_screening_completed": "✅ Parallel screening completed",
-        "parallel_screening_failed": "❌ Parallel screening failed",
-        "user_interrupted": "⚠️  User interrupted operation",
-        "detected_incomplete_task": "🔄 Detected incomplete screening task",
-        "task_id": "Task ID: {id}",
-        "total_records_label": "Total Records: {count}",
-        "screener_count_label": "Screener Count: {count}",
-        "current_progress": "Current Progress: {completed}/{total} ({percent:.1f}%)",
-        "pending_batches_label": "Pending Batches:",
-        "options_label": "Options:",
-        "auto_continue_batches": "1. Auto continue incomplete batches",
-        "restart_all_tasks": "2. Restart all tasks",
-        "cancel_operation": "3. Cancel",
-        "please_select_option": "Please select [1/2/3]: ",
-        "please_enter_valid_option": "Please enter a valid option (1/2/3)",
-        "auto_continue_selected": "✓ Auto continue incomplete tasks",
-        "restart_selected": "✓ Restart tasks",
-        "cancelled_selected": "Cancelled",
-        "startup_failed": "❌ Startup failed: {error}",
-        "new_task_startup_failed": "❌ New task startup failed: {error}",
-        "parallel_execution_starting": "🔄 Starting parallel screening execution...",
-        "parallel_execution_failed": "❌ Parallel screening execution failed: {error}",
-        "resume_screening_failed": "❌ Resume screening failed: {error}",
-        "execution_cancelled_user": "Execution cancelled",
-        "starting_new_parallel": "🚀 Starting parallel screening system"
-    }
-    
-    message = fallback_messages.get(key, key)
+    message = FALLBACK_MESSAGES.get(key, key)
     if message and kwargs:
         try:
             return message.format(**kwargs)
@@ -133,62 +289,139 @@ def get_message_fallback(key, **kwargs):
     return message or key
 
 
+# CPU核心数在进程生命周期内不变，导入时读取一次
+CPU_COUNT = os.cpu_count()
+# 物理核心数（不含超线程），筛选器按物理核心分配
+PHYSICAL_CPU_COUNT = psutil.cpu_count(logical=False) or CPU_COUNT or 4
+
+# 系统资源检测结果的缓存时长（秒）
+CAPACITY_CACHE_SECONDS = 5
+
+# 需要（重新）处理的批次状态
+PENDING_STATUSES = frozenset(('pending', 'failed', 'running'))
+
+# 批次结束状态：立即写入事件日志，中断后恢复时不会重复筛选已完成的批次
+TERMINAL_STATUSES = frozenset(('completed', 'failed', 'error'))
+
+# XML解析后的内存占用约为原始XML大小的倍数（ElementTree/lxml约8-15倍）
+XML_PARSE_MEMORY_FACTOR = 12
+
+
+@functools.lru_cache(maxsize=1)
+def _detect_system_capacity(bucket, min_screeners=1, max_screeners=8):
+    """检测系统资源（bucket为时间分桶，同一分桶内复用结果）"""
+    try:
+        # CPU核心数
+        cpu_cores = CPU_COUNT or 4  # 默认倄4核
+        physical_cores = PHYSICAL_CPU_COUNT
+        
+        # 内存信息
+        memory = psutil.virtual_memory()
+        available_memory_gb = memory.available / (1024**3)
+        total_memory_gb = memory.total / (1024**3)
+        
+        # 磁盘空间
+        disk_usage = psutil.disk_usage('/')
+        available_disk_gb = disk_usage.free / (1024**3)
+        
+        # 推荐配置（保守估算）
+        # 每个筛选器大约需要512MB内存
+        memory_based_limit = int(available_memory_gb // 0.5)
+        cpu_based_limit = max(1, physical_cores - 1)  # 保留一个物理核心给系统
+        
+        recommended_screeners = min(memory_based_limit, cpu_based_limit, max_screeners)
+        
+        # 系统已有较高负载时，只使用空闲的核心
+        load_1m = psutil.getloadavg()[0]
+        if load_1m > physical_cores * 0.5:
+            recommended_screeners = min(recommended_screeners, int(physical_cores - load_1m))
+        
+        return {
+            'cpu_cores': cpu_cores,
+            'physical_cores': physical_cores,
+            'load_average_1m': round(load_1m, 2),
+            'total_memory_gb': round(total_memory_gb, 2),
+            'available_memory_gb': round(available_memory_gb, 2),
+            'available_disk_gb': round(available_disk_gb, 2),
+            'recommended_screeners': max(min_screeners, 1, recommended_screeners),
+            'max_safe_screeners': cpu_based_limit,
+            'memory_per_screener_mb': 512
+        }
+    except Exception as e:
+        print(f"System detection error: {str(e)}")
+        # 返回保守默认值
+        return {
+            'cpu_cores': 2,
+            'physical_cores': 2,
+            'load_average_1m': 0.0,
+            'total_memory_gb': 8.0,
+            'available_memory_gb': 4.0,
+            'available_disk_gb': 10.0,
+            'recommended_screeners': 2,
+            'max_safe_screeners': 2,
+            'memory_per_screener_mb': 512
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def batch_paths(temp_dir, batch_id):
+    """
+    批次文件路径（所有批次文件命名集中在这里）
+    
+    Returns:
+        tuple: (分割XML路径, 结果XML路径, 批次配置路径)
+    """
+    return (
+        os.path.join(temp_dir, f"batch_{batch_id}.xml"),
+        os.path.join(temp_dir, f"batch_{batch_id}_results.xml"),
+        os.path.join(temp_dir, f"config_batch_{batch_id}.json")
+    )
+
+
 class SystemCapacityDetector:
     """系统资源检测器"""
     
     @staticmethod
-    def detect_system_capacity():
-        """检测系统资源并推荐配置"""
-        try:
-            # CPU核心数
-            cpu_cores = os.cpu_count() or 4  # 默认倄4核
-            
-            # 内存信息
-            memory = psutil.virtual_memory()
-            available_memory_gb = memory.available / (1024**3)
-            total_memory_gb = memory.total / (1024**3)
-            
-            # 磁盘空间
-            disk_usage = psutil.disk_usage('/')
-            available_disk_gb = disk_usage.free / (1024**3)
-            
-            # 推荐配置（保守估算）
-            # 每个筛选器大约需要512MB内存
-            memory_based_limit = int(available_memory_gb // 0.5)
-            cpu_based_limit = max(1, cpu_cores - 1)  # 保留一个核心给系统
-            
-            recommended_screeners = min(memory_based_limit, cpu_based_limit, 8)  # 最多8个
-            
-            return {
-                'cpu_cores': cpu_cores,
-                'total_memory_gb': round(total_memory_gb, 2),
-                'available_memory_gb': round(available_memory_gb, 2),
-                'available_disk_gb': round(available_disk_gb, 2),
-                'recommended_screeners': max(1, recommended_screeners),
-                'max_safe_screeners': cpu_based_limit,
-                'memory_per_screener_mb': 512
-            }
-        except Exception as e:
-            print(f"System detection error: {str(e)}")
-            # 返回保守默认值
-            return {
-                'cpu_cores': 2,
-                'total_memory_gb': 8.0,
-                'available_memory_gb': 4.0,
-                'available_disk_gb': 10.0,
-                'recommended_screeners': 2,
-                'max_safe_screeners': 2,
-                'memory_per_screener_mb': 512
-            }
+    def detect_system_capacity(min_screeners=1, max_screeners=8):
+        """
+        检测系统资源并推荐配置（结果缓存数秒，避免重复的系统调用）
+        
+        Args:
+            min_screeners (int): 推荐筛选器数量下限
+            max_screeners (int): 推荐筛选器数量上限
+        """
+        bucket = int(time.monotonic() // CAPACITY_CACHE_SECONDS)
+        return dict(_detect_system_capacity(bucket, min_screeners, max_screeners))
     
     @staticmethod
-    def validate_parallel_config(parallel_config, system_capacity):
+    def estimate_memory_per_screener(input_xml_path, batch_count):
+        """
+        估算每个筛选器的内存占用（MB）
+        
+        以当前进程常驻内存作为基础开销，加上单个批次XML解析后的内存
+        （筛选器同一时间只处理一个批次）
+        """
+        base_rss_mb = psutil.Process(os.getpid()).memory_info().rss / (1024**2)
+        batch_xml_mb = os.path.getsize(input_xml_path) / (1024**2) / max(1, batch_count)
+        return int(base_rss_mb + XML_PARSE_MEMORY_FACTOR * batch_xml_mb)
+    
+    @staticmethod
+    def validate_parallel_config(parallel_config, system_capacity, input_xml_path=None):
         """验证并行配置是否合理"""
         requested_screeners = parallel_config.get('parallel_screeners', 1)
         
         warnings = []
         recommendations = []
         
+        # 有输入文件时按实际批次大小估算内存，并写回system_capacity供后续显示
+        if input_xml_path and os.path.exists(input_xml_path):
+            system_capacity['memory_per_screener_mb'] = \
+                SystemCapacityDetector.estimate_memory_per_screener(
+                    input_xml_path,
+                    requested_screeners * parallel_config.get('batches_per_screener', 4)
+                )
+        memory_per_screener_mb = system_capacity['memory_per_screener_mb']
+        
         # CPU检查
         if requested_screeners > system_capacity['max_safe_screeners']:
             warnings.append(
@@ -202,14 +435,14 @@ class SystemCapacityDetector:
             )
         
         # 内存检查
-        estimated_memory = requested_screeners * system_capacity['memory_per_screener_mb'] / 1024
+        estimated_memory = requested_screeners * memory_per_screener_mb / 1024
         if estimated_memory > system_capacity['available_memory_gb'] * 0.8:
             warnings.append(
                 get_message_fallback("exceed_memory", 
                           estimated=estimated_memory, 
                           available=system_capacity['available_memory_gb'])
             )
-            memory_safe_screeners = int(system_capacity['available_memory_gb'] * 0.8 * 1024 / 512)
+            memory_safe_screeners = int(system_capacity['available_memory_gb'] * 0.8 * 1024 / memory_per_screener_mb)
             recommendations.append(
                 get_message_fallback("recommend_memory_screeners", 
                           count=memory_safe_screeners)
@@ -223,6 +456,7 @@ class SystemCapacityDetector:
             'is_safe': len(warnings) == 0,
             'warnings': warnings,
             'recommendations': recommendations,
+            'memory_per_screener_mb': memory_per_screener_mb,
             'adjusted_screeners': min(
                 requested_screeners,
                 system_capacity['recommended_screeners']
@@ -268,34 +502,224 @@ class RecordDistributor:
     
     @staticmethod
     def print_distribution_table(distributions, total_records):
-        """打印分配表格"""
-        print("\n" + "="*70)
-        print("📋 Record Distribution Plan")
-        print("="*70)
-        print(f"{'Batch':<6} {'Start Record':<12} {'End Record':<10} {'Record Count':<12} {'Percentage':<10}")
-        print("-"*70)
-        
-        for dist in distributions:
-            percentage = (dist['record_count'] / total_records) * 100
-            print(f"{dist['batch_id']:<6} {dist['start_record']:<12} "
-                  f"{dist['end_record']:<10} {dist['record_count']:<12} "
-                  f"{percentage:.1f}%")
-        
-        print("-"*70)
-        print(f"{'Total':<6} {'':<12} {'':<10} {total_records:<12} {'100.0%':<10}")
-        print("="*70)
+        """打印分配表格（整表拼接后一次输出）"""
+        scale = 100.0 / total_records
+        lines = [
+            "\n" + "="*70,
+            "📋 Record Distribution Plan",
+            "="*70,
+            f"{'Batch':<6} {'Start Record':<12} {'End Record':<10} {'Record Count':<12} {'Percentage':<10}",
+            "-"*70
+        ]
+        lines.extend(
+            f"{dist['batch_id']:<6} {dist['start_record']:<12} "
+            f"{dist['end_record']:<10} {dist['record_count']:<12} "
+            f"{dist['record_count'] * scale:.1f}%"
+            for dist in distributions
+        )
+        lines.append("-"*70)
+        lines.append(f"{'Total':<6} {'':<12} {'':<10} {total_records:<12} {'100.0%':<10}")
+        lines.append("="*70)
+        sys.stdout.write("\n".join(lines) + "\n")
+
+
+class ApiRateLimiter:
+    """
+    跨进程共享的令牌桶，限制所有筛选进程合计的LLM API调用频率
+    
+    令牌按 calls_per_minute/60 的速率补充，最多累积 burst 个；
+    每次API调用前取一个令牌，令牌不足时等待
+    """
+    
+    def __init__(self, ctx, calls_per_minute, burst=1):
+        self.rate = calls_per_minute / 60.0
+        self.burst = max(1, burst)
+        self._lock = ctx.Lock()
+        self._tokens = ctx.Value('d', float(self.burst), lock=False)
+        self._updated_at = ctx.Value('d', time.monotonic(), lock=False)
+    
+    def acquire(self):
+        """取一个令牌（阻塞直到可用）"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                tokens = min(self.burst, self._tokens.value + (now - self._updated_at.value) * self.rate)
+                self._updated_at.value = now
+                if tokens >= 1:
+                    self._tokens.value = tokens - 1
+                    return
+                self._tokens.value = tokens
+                wait_seconds = (1 - tokens) / self.rate
+            time.sleep(wait_seconds)
+
+
+# 工作进程内共享的API限流器（由进程池初始化函数设置）
+_API_RATE_LIMITER = None
+
+# 工作进程内缓存的提取器 {配置键: 提取器}：同一进程处理的后续批次复用LLM客户端连接和已生成的提示词
+_EXTRACTOR_CACHE = {}
+
+
+# 工作进程启动前预加载的重依赖（forkserver中只导入一次）
+WORKER_PRELOAD_MODULES = ['lxml.etree', 'pandas', 'openai']
+
+
+def get_worker_context():
+    """
+    工作进程的启动上下文
+    
+    优先使用forkserver：依赖在服务进程中预加载一次，之后每个工作进程直接fork得到；
+    不支持forkserver的平台（如Windows）回退到spawn
+    """
+    if 'forkserver' in mp.get_all_start_methods():
+        ctx = mp.get_context('forkserver')
+        ctx.set_forkserver_preload(WORKER_PRELOAD_MODULES)
+        return ctx
+    return mp.get_context('spawn')
+
+
+def _pin_worker(core_counter):
+    """将当前工作进程绑定到一个CPU核心（按工作进程启动顺序轮流分配）"""
+    with core_counter.get_lock():
+        index = core_counter.value
+        core_counter.value += 1
+    
+    if hasattr(os, 'sched_getaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(CPU_COUNT or 1))
+    core_id = cores[index % len(cores)]
+    
+    try:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, {core_id})
+        else:
+            psutil.Process().cpu_affinity([core_id])
+    except (AttributeError, OSError, psutil.Error):
+        # 平台不支持（如macOS）时保持由系统调度
+        pass
+
+
+def _init_worker(rate_limiter=None, core_counter=None):
+    """工作进程初始化：设置共享的API限流器、可选的CPU绑定；输出按行刷新，避免各批次的日志积压到进程退出时才出现"""
+    global _API_RATE_LIMITER
+    _API_RATE_LIMITER = rate_limiter
+    if core_counter is not None:
+        _pin_worker(core_counter)
+    for stream in (sys.stdout, sys.stderr):
+        if hasattr(stream, 'reconfigure'):
+            stream.reconfigure(line_buffering=True)
+
+
+def execute_batch_screening(config_path):
+    """
+    直接执行单个批次的筛选逻辑（在工作进程中运行）
+    
+    Returns:
+        dict: 成功时返回 {'xml': 结果XML路径, 'excel': Excel报告路径}，失败返回None
+    """
+    try:
+        # 加载批次配置
+        config = load_config(config_path)
+        validate_config(config)
+        
+        # 提取配置值
+        paths = config['paths']
+        processing = config.get('processing', {})
+        
+        # 处理研究设计配置
+        if 'study_designs' in config:
+            excluded_designs = config['study_designs'].get('excluded_study_designs', [])
+            included_designs = config['study_designs'].get('included_study_designs', [])
+        else:
+            excluded_designs = config.get('excluded_study_designs', [])
+            included_designs = config.get('included_study_designs', [])
+        
+        llm_configs = config['llm_configs']
+        inclusion_criteria = config['inclusion_criteria']
+        exclusion_criteria = config.get('exclusion_criteria', {})
+        
+        # 验证输入文件
+        input_xml_path = paths['input_xml_path']
+        check_file_exists(input_xml_path, "Input XML file")
+        
+        # 创建输出目录
+        output_xml_path = paths['output_xml_path']
+        create_output_directory(output_xml_path)
+        
+        # 获取提取器（配置相同的批次复用同一实例，只重置Token统计）
+        extractor_key = json.dumps([
+            llm_configs, inclusion_criteria, exclusion_criteria,
+            paths.get('prompt_file_path'), paths.get('positive_prompt_file_path'),
+            paths.get('negative_prompt_file_path'), processing.get('concurrent_studies', 1)
+        ], sort_keys=True, default=str)
+        extractor = _EXTRACTOR_CACHE.get(extractor_key)
+        if extractor is None:
+            extractor = SystematicReviewExtractor(
+                screening_llm_configs=llm_configs['screening_llms'],
+                prompt_llm_config=llm_configs.get('prompt_llm'),
+                positive_prompt_path=paths.get('positive_prompt_file_path'),
+                negative_prompt_path=paths.get('negative_prompt_file_path'),
+                rate_limiter=_API_RATE_LIMITER,
+                max_concurrent_studies=processing.get('concurrent_studies', 1)
+            )
+            _EXTRACTOR_CACHE[extractor_key] = extractor
+        else:
+            extractor.reset_token_usage()
+        
+        # 解析XML文件
+        parsed_records, tree, root = extractor.parse_xml(input_xml_path)
+        
+        # 处理记录跳过
+        skip_records_count = processing.get('skip_records_count', 0)
+        if skip_records_count > 0:
+            records_to_process = parsed_records[skip_records_count:]
+        else:
+            records_to_process = parsed_records
+        
+        # 设置研究设计过滤
+        extractor.set_excluded_study_designs(excluded_designs)
+        extractor.set_included_study_designs(included_designs)
+        
+        # 处理记录
+        xml_path, excel_path = extractor.process_records(
+            records_to_process, 
+            inclusion_criteria, 
+            output_xml_path, 
+            tree,
+            exclusion_criteria=exclusion_criteria,
+            prompt_file_path=paths.get('prompt_file_path')
+        )
+        
+        return {'xml': os.path.abspath(xml_path), 'excel': excel_path and os.path.abspath(excel_path)}
+        
+    except Exception as e:
+        print(f"批次筛选执行失败: {str(e)}")
+        return None
 
 
 class ParallelScreeningManager:
     """并行筛选管理器"""
     
-    def __init__(self, config_path="config.json"):
+    # 状态写入线程的控制指令
+    _FLUSH_EVENTS = 'flush'
+    _STOP_WRITER = 'stop'
+    
+    def __init__(self, config_path="config.json", ready_event=None):
         self.config_path = config_path
+        self.ready_event = ready_event  # 状态文件可供监控读取时置位（可选）
         self.config: dict = {}      # 统一配置
         self.state_file = ""
         self.temp_dir = ""
         self.processes = {}
         self.batch_status = {}
+        self._status_counts = None  # check_existing_state统计的各状态批次数
+        self._batch_index = None    # (状态对象, {batch_id: 批次})，状态更新时按ID直接定位批次
+        
+        # 批次事件缓冲：累计到阈值或超过时间间隔才写入事件日志
+        self._event_flush_threshold = 1
+        self._event_flush_interval_s = 2.0
+        self._start_state_writer()
         
         # 输出控制锁
         self.print_lock = threading.Lock()
@@ -304,8 +728,15 @@ class ParallelScreeningManager:
         # 加载配置
         self.load_configurations()
         
+        # 批次配置模板（只构建一次，各批次仅修改路径）
+        self._batch_template = self._build_batch_template()
+        
         # 初始化系统检测
-        self.system_capacity = SystemCapacityDetector.detect_system_capacity()
+        parallel_settings = self.config['parallel_settings']
+        self.system_capacity = SystemCapacityDetector.detect_system_capacity(
+            parallel_settings.get('min_screeners', 1),
+            parallel_settings.get('max_screeners', 8)
+        )
         
         # 创建临时目录
         self.setup_temp_directory()
@@ -323,10 +754,11 @@ class ParallelScreeningManager:
         self.quiet_mode = quiet
     
     def load_configurations(self):
-        """加载统一配置文件"""
+        """加载并校验统一配置文件（只在初始化时执行一次，之后直接使用self.config）"""
         try:
             # 加载统一配置文件
             self.config = load_config(self.config_path)
+            validate_config(self.config)
             
             # 检查是否包含并行配置
             if 'parallel_settings' not in self.config:
@@ -381,7 +813,8 @@ class ParallelScreeningManager:
             
         validation = SystemCapacityDetector.validate_parallel_config(
             self.config['parallel_settings'],
-            self.system_capacity
+            self.system_capacity,
+            self.config['paths'].get('input_xml_path')
         )
         
         if not validation['is_safe']:
@@ -418,12 +851,18 @@ class ParallelScreeningManager:
         """检查是否存在未完成的任务"""
         if os.path.exists(self.state_file):
             try:
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    state = json.load(f)
+                # 状态快照 + 批次事件日志
+                state = load_state(self.state_file)
                 
-                # 检查是否有未完成的批次
-                pending_batches = [b for b in state['batches'] 
-                                 if b['status'] in ['pending', 'failed', 'running']]
+                # 一次遍历同时统计各状态数量并收集未完成的批次
+                status_counts = Counter()
+                pending_batches = []
+                for batch in state['batches']:
+                    status = batch['status']
+                    status_counts[status] += 1
+                    if status in PENDING_STATUSES:
+                        pending_batches.append(batch)
+                self._status_counts = status_counts
                 
                 if pending_batches:
                     return state, pending_batches
@@ -442,8 +881,9 @@ class ParallelScreeningManager:
         print(get_message_fallback("total_records_label", count=state['total_records']))
         print(get_message_fallback("screener_count_label", count=state['parallel_screeners']))
         
-        completed = sum(1 for b in state['batches'] if b['status'] == 'completed')
-        total = len(state['batches'])
+        status_counts = self._status_counts or Counter(b['status'] for b in state['batches'])
+        completed = status_counts['completed']
+        total = sum(status_counts.values())
         progress = (completed / total) * 100
         
         print(get_message_fallback("current_progress", completed=completed, total=total, percent=progress))
@@ -465,15 +905,8 @@ class ParallelScreeningManager:
                 return choice
             print(get_message_fallback('please_enter_valid_option'))
     
-    def _ensure_config_loaded(self):
-        """确保配置已加载"""
-        if not self.config:
-            raise Exception("Configuration file not loaded, please call load_configurations() first")
-    
     def create_session_state(self, total_records, distributions):
         """创建新的会话状态"""
-        self._ensure_config_loaded()
-        
         session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         state = {
@@ -486,13 +919,21 @@ class ParallelScreeningManager:
             'temp_dir': self.temp_dir
         }
         
-        # 保存状态文件
-        with open(self.state_file, 'w', encoding='utf-8') as f:
-            json.dump(state, f, indent=2, ensure_ascii=False)
+        # 原子保存状态快照，并清空上一会话的批次事件（同一把锁内完成，读取方不会看到新旧混合的状态）
+        self.flush_batch_events()
+        with state_file_lock(self.state_file):
+            _atomic_write_json(self.state_file, state)
+            reset_batch_events(self.state_file)
         
         self.safe_print(f"✓ Session state saved: {session_id}")
+        self._notify_state_ready()
         return state
     
+    def _notify_state_ready(self):
+        """通知等待中的监控线程：状态文件已就绪"""
+        if self.ready_event is not None:
+            self.ready_event.set()
+    
     def start_parallel_screening(self):
         """启动并行筛选"""
         try:
@@ -534,22 +975,21 @@ class ParallelScreeningManager:
     def start_new_screening(self):
         """开始新的筛选任务"""
         try:
-            self._ensure_config_loaded()
-            
             # 统计记录数量
             input_xml_path = self.config['paths']['input_xml_path']
             print(f"\n📖 Analyzing input file: {os.path.basename(input_xml_path)}")
             
-            total_records = self.count_xml_records(input_xml_path)
-            print(f"✓ Detected {total_records} records")
-            
-            # 计算分配方案
+            # 计数、分配与分割在同一个流式流程中完成
+            # 记录切分为 筛选器数×batches_per_screener 个小批次，空闲的筛选器继续领取剩余批次
             parallel_screeners = self.config['parallel_settings']['parallel_screeners']
-            
-            distributions = RecordDistributor.calculate_distribution(total_records, parallel_screeners)
+            batches_per_screener = self.config['parallel_settings'].get('batches_per_screener', 4)
+            total_records, distributions, split_files = self._stream_split_and_count(
+                input_xml_path, parallel_screeners * batches_per_screener
+            )
+            print(f"✓ Detected {total_records} records")
             
             # 显示简化的分配信息
-            print(f"\n📋 Distribution: {total_records} records → {parallel_screeners} screeners")
+            print(f"\n📋 Distribution: {total_records} records → {len(distributions)} batches on {parallel_screeners} screeners")
             for i, dist in enumerate(distributions[:3]):  # 只显示前3个
                 print(f"  Batch {dist['batch_id']}: {dist['record_count']} records")
             if len(distributions) > 3:
@@ -558,6 +998,9 @@ class ParallelScreeningManager:
             # 确认执行
             choice = input(f"\nStart parallel screening? [y/N]: ")
             if choice.lower() != 'y':
+                for split_file in split_files:
+                    if os.path.exists(split_file):
+                        os.remove(split_file)
                 print(get_message_fallback("execution_cancelled_user"))
                 return False
             
@@ -567,21 +1010,22 @@ class ParallelScreeningManager:
             # 创建会话状态
             state = self.create_session_state(total_records, distributions)
             
-            # 执行分割和筛选
-            return self.execute_parallel_screening(state)
+            # 执行筛选（XML已分割）
+            return self.execute_parallel_screening(state, split_files)
             
         except Exception as e:
             print(f"❌ New task startup failed: {str(e)}")
             traceback.print_exc()
             return False
     
-    def execute_parallel_screening(self, state):
+    def execute_parallel_screening(self, state, split_files=None):
         """执行并行筛选"""
         try:
             print(f"\n{get_message_fallback('parallel_execution_starting')}")
             
-            # 1. 分割XML文件
-            split_files = self.split_xml_file(state)
+            # 1. 分割XML文件（已预先分割时跳过）
+            if split_files is None:
+                split_files = self.split_xml_file(state)
             if not split_files:
                 return False
             
@@ -600,18 +1044,19 @@ class ParallelScreeningManager:
         """恢复筛选"""
         try:
             print("\n🔄 Resuming screening processes...")
+            self._notify_state_ready()
             
             # 为待处理批次创建配置
             batch_configs = []
             for batch in pending_batches:
                 batch_id = batch['batch_id']
-                config_path = os.path.join(self.temp_dir, f"config_batch_{batch_id}.json")
+                split_file, _, config_path = self._batch_paths(batch_id)
                 
                 if os.path.exists(config_path):
                     batch_configs.append({
                         'batch_info': batch,
                         'config_path': config_path,
-                        'split_file': os.path.join(self.temp_dir, f"batch_{batch_id}.xml")
+                        'split_file': split_file
                     })
                 else:
                     print(f"⚠️  Batch {batch_id} configuration file missing, recreating...")
@@ -630,19 +1075,12 @@ class ParallelScreeningManager:
     def split_xml_file(self, state):
         """分割XML文件"""
         try:
-            self._ensure_config_loaded()
-            
             self.safe_print("\n📄 Starting XML file splitting...")
             
             input_xml_path = self.config['paths']['input_xml_path']
-            splitter = XMLSplitter()
             
             # 生成分割文件名列表
-            split_files = []
-            for batch in state['batches']:
-                batch_id = batch['batch_id']
-                split_file = os.path.join(self.temp_dir, f"batch_{batch_id}.xml")
-                split_files.append(split_file)
+            split_files = [self._batch_paths(batch['batch_id'])[0] for batch in state['batches']]
             
             # 使用自定义分割逻辑
             self.custom_split_xml(input_xml_path, state['batches'], split_files)
@@ -654,54 +1092,114 @@ class ParallelScreeningManager:
             print(f"❌ XML splitting failed: {str(e)}")
             return []
     
+    def _stream_split_and_count(self, input_xml_path, batch_count):
+        """
+        一次字节扫描完成记录计数、分配方案计算与XML分割（批次数不超过记录数）
+        
+        Returns:
+            tuple: (total_records, distributions, split_files)
+        """
+        with open(input_xml_path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            spans = index_xml_records(mm) if can_index_xml_records(mm) else None
+            total_records = len(spans) if spans is not None else XMLSplitter().count_records(input_xml_path)
+            distributions = RecordDistributor.calculate_distribution(
+                total_records, max(1, min(batch_count, total_records))
+            )
+            split_files = [self._batch_paths(batch['batch_id'])[0] for batch in distributions]
+            if spans is not None:
+                self._write_split_files(mm, spans, distributions, split_files)
+        if spans is None:
+            self._parse_split_files(input_xml_path, distributions, split_files)
+        return total_records, distributions, split_files
+    
     def custom_split_xml(self, input_xml_path, batches, output_files):
-        """自定义XML分割逻辑"""
+        """自定义XML分割逻辑（按字节偏移直接复制记录；含CDATA段或注释时改为流式解析）"""
         try:
-            import xml.etree.ElementTree as ET
-            
-            # 解析原始XML
-            tree = ET.parse(input_xml_path)
-            root = tree.getroot()
-            records = root.findall('.//record')
-            
-            self.safe_print(f"Total records: {len(records)}")
+            with open(input_xml_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if can_index_xml_records(mm):
+                    self._write_split_files(mm, index_xml_records(mm), batches, output_files)
+                    return
+            self._parse_split_files(input_xml_path, batches, output_files)
+        except Exception as e:
+            raise Exception(f"Custom splitting failed: {str(e)}")
+    
+    def _parse_split_files(self, input_xml_path, batches, output_files):
+        """
+        流式解析分割：每条<record>解析后立即序列化写入所属批次文件并释放
+        
+        用于字节扫描无法可靠定位记录的文件（含CDATA段或注释）。根元素属性及
+        <records>之前的非记录子元素会复制到每个批次文件中
+        """
+        out = None
+        try:
+            batch_index = 0
+            record_index = 0
+            header = footer = b""
             
-            # 按批次分割
-            for i, batch in enumerate(batches):
-                start_idx = batch['start_record'] - 1  # 转换为0基索引
-                end_idx = batch['end_record']  # end_record是包含的
-                
-                # 创建新的XML结构
-                new_root = ET.Element(root.tag)
-                
-                # 复制根元素属性
-                for key, value in root.attrib.items():
-                    new_root.set(key, value)
-                
-                # 复制非records的子元素
-                for child in root:
-                    if child.tag != 'records':
-                        new_root.append(child)
-                
-                # 创建records容器
-                records_elem = ET.SubElement(new_root, 'records')
+            for root, record in iter_xml_records(input_xml_path):
+                if batch_index >= len(batches):
+                    break
+                record_index += 1
+                batch = batches[batch_index]
                 
-                # 添加该批次的记录
-                batch_records = records[start_idx:end_idx]
-                for record in batch_records:
-                    records_elem.append(record)
+                if out is None:
+                    if not header:
+                        attrs = "".join(f" {key}={quoteattr(value)}" for key, value in root.attrib.items())
+                        preamble = [child for child in root if child.tag not in ('records', 'record')]
+                        header = (
+                            f"<?xml version='1.0' encoding='utf-8'?>\n<{root.tag}{attrs}>\n".encode('utf-8')
+                            + b"".join(b"  " + element_to_bytes(child).strip() + b"\n" for child in preamble)
+                            + b"  <records>\n"
+                        )
+                        footer = f"  </records>\n</{root.tag}>\n".encode('utf-8')
+                    out = open(output_files[batch_index], 'wb')
+                    out.write(header)
                 
-                # 保存文件
-                new_tree = ET.ElementTree(new_root)
-                ET.indent(new_tree, space="  ", level=0)
-                new_tree.write(output_files[i], encoding='utf-8', xml_declaration=True)
+                out.write(b"    " + element_to_bytes(record) + b"\n")
                 
-                # 只显示前几个批次的详细信息
-                if i < 3 or not self.quiet_mode:
-                    self.safe_print(f"  Batch {batch['batch_id']}: {len(batch_records)} records -> {os.path.basename(output_files[i])}")
-            
-        except Exception as e:
-            raise Exception(f"Custom splitting failed: {str(e)}")
+                if record_index >= batch['end_record']:
+                    out.write(footer)
+                    out.close()
+                    out = None
+                    # 只显示前几个批次的详细信息
+                    if batch_index < 3 or not self.quiet_mode:
+                        self.safe_print(f"  Batch {batch['batch_id']}: {batch['record_count']} records -> {os.path.basename(output_files[batch_index])}")
+                    batch_index += 1
+            
+            self.safe_print(f"Total records: {record_index}")
+        finally:
+            if out is not None:
+                out.close()
+    
+    def _write_split_files(self, data, spans, batches, output_files):
+        """
+        将记录的原始字节按批次写入分割文件
+        
+        首条记录之前的内容（XML声明、根元素、<records>）作为每个文件的头部，
+        末条记录之后的内容作为尾部，记录本身不经解析原样复制
+        """
+        if not spans:
+            raise ValueError("No <record> elements found")
+        
+        self.safe_print(f"Total records: {len(spans)}")
+        
+        header = data[:spans[0][0]]
+        footer = data[spans[-1][1]:].lstrip()
+        
+        for i, batch in enumerate(batches):
+            batch_spans = spans[batch['start_record'] - 1:batch['end_record']]
+            with open(output_files[i], 'wb') as out:
+                out.write(header)
+                for start, end in batch_spans:
+                    out.write(data[start:end])
+                    out.write(b"\n")
+                out.write(footer)
+            
+            # 只显示前几个批次的详细信息
+            if i < 3 or not self.quiet_mode:
+                self.safe_print(f"  Batch {batch['batch_id']}: {len(batch_spans)} records -> {os.path.basename(output_files[i])}")
     
     def create_batch_configs(self, state, split_files):
         """为每个批次创建配置文件"""
@@ -726,47 +1224,43 @@ class ParallelScreeningManager:
             print(f"❌ Batch configuration creation failed: {str(e)}")
             return []
     
+    def _build_batch_template(self):
+        """构建单批次配置模板：去除并行相关配置，设为单线程模式且不跳过记录"""
+        template = {
+            key: value for key, value in self.config.items()
+            if key not in ('parallel_settings', 'resource_management', 'output_settings')
+        }
+        # 通过JSON往返生成独立快照
+        template = json.loads(json.dumps(template))
+        
+        # 设置为单线程模式
+        template['mode']['screening_mode'] = 'single'
+        # 设置跳过记录数为0（因为已经分割）
+        template['processing']['skip_records_count'] = 0
+        return template
+    
+    def _batch_paths(self, batch_id):
+        """当前临时目录下的批次文件路径 (split, result, config)"""
+        return batch_paths(self.temp_dir, batch_id)
+    
     def create_single_batch_config(self, batch, split_file=None):
         """创建单个批次的配置"""
-        self._ensure_config_loaded()
-        
         batch_id = batch['batch_id']
+        default_split_file, result_file, config_path = self._batch_paths(batch_id)
         
         if split_file is None:
-            split_file = os.path.join(self.temp_dir, f"batch_{batch_id}.xml")
-        
-        # 复制统一配置（去除并行部分）
-        if not self.config:
-            raise Exception("Unified configuration not loaded")
-            
-        import copy
-        batch_config = copy.deepcopy(self.config)
+            split_file = default_split_file
         
-        # 设置为单线程模式
-        batch_config['mode']['screening_mode'] = 'single'
-        
-        # 删除并行相关配置
-        if 'parallel_settings' in batch_config:
-            del batch_config['parallel_settings']
-        if 'resource_management' in batch_config:
-            del batch_config['resource_management']
-        if 'output_settings' in batch_config:
-            del batch_config['output_settings']
-        
-        # 修改路径配置
-        batch_config['paths']['input_xml_path'] = os.path.abspath(split_file)
-        batch_config['paths']['output_xml_path'] = os.path.abspath(
-            os.path.join(self.temp_dir, f"batch_{batch_id}_results.xml")
+        # 浅复制批次模板，只替换路径部分
+        batch_config = copy.copy(self._batch_template)
+        batch_config['paths'] = dict(
+            self._batch_template['paths'],
+            input_xml_path=os.path.abspath(split_file),
+            output_xml_path=os.path.abspath(result_file)
         )
         
-        # 设置跳过记录数为0（因为已经分割）
-        batch_config['processing']['skip_records_count'] = 0
-        
         # 保存批次配置文件
-        config_path = os.path.join(self.temp_dir, f"config_batch_{batch_id}.json")
-        with open(config_path, 'w', encoding='utf-8') as f:
-            import json
-            json.dump(batch_config, f, indent=2, ensure_ascii=False)
+        write_json_file(config_path, batch_config)
         
         return {
             'batch_info': batch,
@@ -777,58 +1271,72 @@ class ParallelScreeningManager:
     def start_parallel_processes(self, state, batch_configs):
         """启动并行筛选进程"""
         try:
-            self._ensure_config_loaded()
-            
-            import threading
-            from datetime import datetime
-            
             print(f"\n🚀 Starting {len(batch_configs)} parallel screening processes...")
             
-            # 更新状态文件
-            for batch_config in batch_configs:
-                batch_info = batch_config['batch_info']
-                batch_info['status'] = 'running'
-                batch_info['started_at'] = datetime.now().isoformat()
-                batch_info['config_path'] = batch_config['config_path']
-                batch_info['split_file'] = batch_config['split_file']
+            # 批次较多时合并写入状态事件
+            self._event_flush_threshold = max(1, len(batch_configs) // 16)
+            self._event_flush_interval_s = self.config['parallel_settings'].get('state_flush_interval', 2.0)
             
-            self.save_state(state)
+            # 记录批次启动事件（所有批次共用同一个启动时间）
+            started_at = datetime.now().isoformat()
+            for batch_config in batch_configs:
+                self.update_batch_status(state, batch_config['batch_info']['batch_id'], 'running', {
+                    'started_at': started_at,
+                    'config_path': batch_config['config_path'],
+                    'split_file': batch_config['split_file']
+                }, timestamp=started_at)
+            
+            # 启动进程池：固定数量的工作进程从任务队列中领取批次，
+            # 先完成的进程继续处理剩余批次，避免慢批次拖住其他筛选器
+            resource_settings = self.config['resource_management']
+            pool_size = self._worker_pool_size(len(batch_configs))
+            ctx = get_worker_context()
+            
+            # 配置了API调用频率上限时由共享令牌桶限流，各批次无需错开启动
+            calls_per_minute = resource_settings.get('api_calls_per_minute_limit')
+            if calls_per_minute:
+                rate_limiter = ApiRateLimiter(ctx, calls_per_minute, burst=pool_size)
+                delay = 0
+            else:
+                rate_limiter = None
+                delay = resource_settings.get('delay_between_screeners', 2)
             
-            # 启动线程池
-            threads = []
-            delay = self.config['resource_management'].get('delay_between_screeners', 2)
+            # 可选：每个工作进程绑定到不同的CPU核心
+            core_counter = ctx.Value('i', 0) if resource_settings.get('pin_cpu_affinity', False) else None
             
-            for i, batch_config in enumerate(batch_configs):
-                batch_id = batch_config['batch_info']['batch_id']
-                config_path = batch_config['config_path']
-                
-                # 创建线程
-                thread = threading.Thread(
-                    target=self.run_single_batch,
-                    args=(batch_id, config_path, state)
-                )
+            log_listener = _start_log_listener()
+            try:
+                with ProcessPoolExecutor(max_workers=pool_size, mp_context=ctx, initializer=_init_worker,
+                                         initargs=(rate_limiter, core_counter)) as executor:
+                    futures = {}
+                    for i, batch_config in enumerate(batch_configs):
+                        batch_id = batch_config['batch_info']['batch_id']
+                        future = executor.submit(execute_batch_screening, batch_config['config_path'])
+                        futures[future] = batch_id
+                    
+                        logger.info(f"  ✓ Batch {batch_id} queued")
+                    
+                        # 只错开各筛选器的首个批次，其余批次排队等待空闲进程
+                        if delay and i < pool_size - 1:
+                            time.sleep(delay)
                 
-                thread.start()
-                threads.append(thread)
+                    # 启动监控
+                    logger.info("\n📊 Starting progress monitoring...")
+                    self.progress_monitor = ProgressMonitor(
+                        self.state_file, 5,
+                        alternate_screen=self.config['parallel_settings'].get('monitor_alternate_screen', False)
+                    )
+                    self.progress_monitor.start_monitoring()
                 
-                print(f"  ✓ Batch {batch_id} thread started")
+                    # 等待所有批次完成
+                    logger.info("\n⏳ Waiting for all batches to complete...")
+                    self.wait_for_batch_results(futures, state)
+                    self.flush_batch_events()
                 
-                # 延迟启动下一个线程
-                if i < len(batch_configs) - 1:
-                    time.sleep(delay)
-            
-            # 启动监控
-            print("\n📊 Starting progress monitoring...")
-            from progress_monitor import ProgressMonitor
-            self.progress_monitor = ProgressMonitor(self.state_file, 5)
-            self.progress_monitor.start_monitoring()
-            
-            # 等待所有线程完成
-            print("\n⏳ Waiting for all batches to complete...")
-            self.wait_for_completion_threads(threads, state)
-            
-            # 停止监控
-            self.progress_monitor.stop_monitoring()
+                    # 停止监控
+                    self.progress_monitor.stop_monitoring()
+            finally:
+                log_listener.stop()
             
             # 合并结果
             print("\n🔄 Merging screening results...")  
@@ -839,200 +1347,151 @@ class ParallelScreeningManager:
             traceback.print_exc()
             return False
     
-    def _execute_single_batch_screening(self, config_path):
-        """直接执行单个批次的筛选逻辑"""
-        try:
-            from src.extractor import SystematicReviewExtractor
-            from src.utils import load_config, validate_config, create_output_directory, check_file_exists
-            
-            # 加载批次配置
-            config = load_config(config_path)
-            validate_config(config)
-            
-            # 提取配置值
-            paths = config['paths']
-            processing = config.get('processing', {})
-            
-            # 处理研究设计配置
-            if 'study_designs' in config:
-                excluded_designs = config['study_designs'].get('excluded_study_designs', [])
-                included_designs = config['study_designs'].get('included_study_designs', [])
-            else:
-                excluded_designs = config.get('excluded_study_designs', [])
-                included_designs = config.get('included_study_designs', [])
-            
-            llm_configs = config['llm_configs']
-            inclusion_criteria = config['inclusion_criteria']
-            exclusion_criteria = config.get('exclusion_criteria', {})
-            
-            # 验证输入文件
-            input_xml_path = paths['input_xml_path']
-            check_file_exists(input_xml_path, "Input XML file")
-            
-            # 创建输出目录
-            output_xml_path = paths['output_xml_path']
-            create_output_directory(output_xml_path)
-            
-            # 初始化提取器
-            extractor = SystematicReviewExtractor(
-                screening_llm_configs=llm_configs['screening_llms'],
-                prompt_llm_config=llm_configs.get('prompt_llm'),
-                positive_prompt_path=paths.get('positive_prompt_file_path'),
-                negative_prompt_path=paths.get('negative_prompt_file_path')
-            )
-            
-            # 解析XML文件
-            parsed_records, tree, root = extractor.parse_xml(input_xml_path)
-            
-            # 处理记录跳过
-            skip_records_count = processing.get('skip_records_count', 0)
-            if skip_records_count > 0:
-                records_to_process = parsed_records[skip_records_count:]
-            else:
-                records_to_process = parsed_records
-            
-            # 设置研究设计过滤
-            extractor.set_excluded_study_designs(excluded_designs)
-            extractor.set_included_study_designs(included_designs)
-            
-            # 处理记录
-            extractor.process_records(
-                records_to_process, 
-                inclusion_criteria, 
-                output_xml_path, 
-                tree,
-                exclusion_criteria=exclusion_criteria,
-                prompt_file_path=paths.get('prompt_file_path')
-            )
-            
-            return True
-            
-        except Exception as e:
-            print(f"批次筛选执行失败: {str(e)}")
-            return False
+    def _record_batch_result(self, state, batch_id, output_files):
+        """记录工作进程返回的批次结果（成功时带有实际生成的输出文件路径）"""
+        now = datetime.now().isoformat()
+        if output_files:
+            # 成功完成
+            self.update_batch_status(state, batch_id, 'completed', {
+                'completed_at': now,
+                'output_files': output_files
+            }, timestamp=now)
+            logger.info(f"✅ Batch {batch_id} completed")
+        else:
+            # 失败
+            self.update_batch_status(state, batch_id, 'failed', {
+                'failed_at': now,
+                'error': 'Screening process execution failed'
+            }, timestamp=now)
+            logger.info(f"❌ Batch {batch_id} failed")
     
-    def run_single_batch(self, batch_id, config_path, state):
-        """运行单个批次的筛选"""
+    def _record_batch_error(self, state, batch_id, error):
+        """记录工作进程异常退出的批次"""
+        now = datetime.now().isoformat()
+        self.update_batch_status(state, batch_id, 'error', {
+            'failed_at': now,
+            'error': str(error)
+        }, timestamp=now)
+        logger.error(f"💥 Batch {batch_id} error: {str(error)}")
+    
+    def update_batch_status(self, state, batch_id, status, extra_data=None, timestamp=None):
+        """更新批次状态（追加到事件日志，不重写状态文件；timestamp为预先生成的事件时间）"""
         try:
-            from datetime import datetime
-            
-            # 更新批次状态
-            self.update_batch_status(state, batch_id, 'running', {
-                'started_at': datetime.now().isoformat()
-            })
+            # 同步内存中的状态
+            batch = self._find_batch(state, batch_id)
+            if batch is not None:
+                batch['status'] = status
+                if extra_data:
+                    batch.update(extra_data)
             
-            # 直接调用筛选逻辑
-            success = self._execute_single_batch_screening(config_path)
+            # 只入队，由状态写入线程合并后写入事件日志
+            self._status_queue.put(make_batch_event(batch_id, status, extra_data, timestamp))
             
-            if success:
-                # 成功完成
-                # 找到实际生成的Excel文件
-                excel_pattern = os.path.join(self.temp_dir, f"batch_{batch_id}_results*.xlsx")
-                import glob
-                excel_files = glob.glob(excel_pattern)
-                excel_file = excel_files[0] if excel_files else os.path.join(self.temp_dir, f"batch_{batch_id}_results.xlsx")
-                
-                self.update_batch_status(state, batch_id, 'completed', {
-                    'completed_at': datetime.now().isoformat(),
-                    'output_files': {
-                        'xml': os.path.join(self.temp_dir, f"batch_{batch_id}_results.xml"),
-                        'excel': excel_file
-                    }
-                })
-                print(f"✅ Batch {batch_id} completed")
-            else:
-                # 失败
-                self.update_batch_status(state, batch_id, 'failed', {
-                    'failed_at': datetime.now().isoformat(),
-                    'error': 'Screening process execution failed'
-                })
-                print(f"❌ Batch {batch_id} failed")
-                
         except Exception as e:
-            # 错误
-            from datetime import datetime
-            self.update_batch_status(state, batch_id, 'error', {
-                'failed_at': datetime.now().isoformat(),
-                'error': str(e)
-            })
-            print(f"💥 Batch {batch_id} error: {str(e)}")
-            traceback.print_exc()
+            logger.warning(f"⚠️  Failed to update batch status: {str(e)}")
     
-    def update_batch_status(self, state, batch_id, status, extra_data=None):
-        """更新批次状态"""
-        try:
-            # 加载最新状态
-            if os.path.exists(self.state_file):
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    current_state = json.load(f)
-            else:
-                current_state = state
-            
-            # 更新指定批次
-            for batch in current_state['batches']:
-                if batch['batch_id'] == batch_id:
-                    batch['status'] = status
-                    if extra_data:
-                        batch.update(extra_data)
+    def _find_batch(self, state, batch_id):
+        """按批次ID查找内存状态中的批次（索引随状态对象建立一次，避免每次更新都遍历所有批次）"""
+        if self._batch_index is None or self._batch_index[0] is not state:
+            self._batch_index = (state, {batch['batch_id']: batch for batch in state['batches']})
+        return self._batch_index[1].get(batch_id)
+    
+    def _start_state_writer(self):
+        """启动状态写入线程（进程退出时写完剩余事件后停止）"""
+        self._status_queue = queue.Queue()
+        self._writer_thread = threading.Thread(target=self._state_writer_loop, daemon=True)
+        self._writer_thread.start()
+        atexit.register(self._stop_state_writer)
+    
+    def _state_writer_loop(self):
+        """
+        状态写入线程：取出排队的批次事件，合并后一次追加到事件日志
+        
+        批次结束事件立即写入并落盘（fsync）；其余事件（如running）只是进度信息，
+        累积到数量阈值或超过时间间隔后写入，不强制落盘
+        """
+        while True:
+            events = []
+            command = None
+            item = self._status_queue.get()
+            deadline = time.monotonic() + self._event_flush_interval_s
+            while True:
+                if not isinstance(item, dict):
+                    command = item
+                    break
+                events.append(item)
+                if item['status'] in TERMINAL_STATUSES or len(events) >= self._event_flush_threshold:
+                    break
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._status_queue.get(timeout=timeout)
+                except queue.Empty:
                     break
             
-            # 保存状态
-            self.save_state(current_state)
+            durable = any(event['status'] in TERMINAL_STATUSES for event in events)
+            try:
+                append_batch_events(self.state_file, events, durable=durable)
+            except Exception as e:
+                print(f"⚠️  Failed to update batch status: {str(e)}")
+            finally:
+                for _ in range(len(events) + (command is not None)):
+                    self._status_queue.task_done()
             
-        except Exception as e:
-            print(f"⚠️  Failed to update batch status: {str(e)}")
+            if command == self._STOP_WRITER:
+                return
     
-    def wait_for_completion_threads(self, threads, state):
-        """等待所有线程完成"""
-        try:
-            completed = 0
-            total = len(threads)
-            
-            # 等待所有线程完成
-            for thread in threads:
-                thread.join()
-                completed += 1
-                print(f"Thread completed: {completed}/{total}")
-            
-            print(f"✅ All batches processing completed")
-            
-        except Exception as e:
-            print(f"⚠️  Error waiting for threads to complete: {str(e)}")
+    def flush_batch_events(self):
+        """等待已排队的批次事件全部写入事件日志"""
+        if self._writer_thread.is_alive():
+            self._status_queue.put(self._FLUSH_EVENTS)
+            self._status_queue.join()
+    
+    def _stop_state_writer(self):
+        """写完剩余事件并停止状态写入线程"""
+        if self._writer_thread.is_alive():
+            self._status_queue.put(self._STOP_WRITER)
+            self._writer_thread.join()
+    
+    def _worker_pool_size(self, batch_count):
+        """工作进程数：不超过批次数、筛选器数量以及可选的max_workers上限"""
+        parallel_settings = self.config['parallel_settings']
+        pool_size = min(batch_count, parallel_settings['parallel_screeners'])
+        max_workers = parallel_settings.get('max_workers')
+        if max_workers:
+            pool_size = min(pool_size, max_workers)
+        return max(1, pool_size)
     
-    def wait_for_completion(self, processes, state):
-        """等待所有进程完成"""
+    def wait_for_batch_results(self, futures, state):
+        """按完成顺序等待所有批次，并在主进程中记录批次状态"""
         try:
             completed = 0
-            total = len(processes)
+            total = len(futures)
             
-            while completed < total:
-                time.sleep(5)
-                
-                # 检查进程状态
-                for i, process in enumerate(processes):
-                    if process and process.is_alive():
-                        continue
-                    elif process:
-                        # 进程已结束
-                        processes[i] = None
-                        completed += 1
-                        print(f"Process completed: {completed}/{total}")
+            for future in as_completed(futures):
+                batch_id = futures[future]
+                error = future.exception()
+                if error is None:
+                    self._record_batch_result(state, batch_id, future.result())
+                else:
+                    self._record_batch_error(state, batch_id, error)
+                completed += 1
+                logger.info(f"Batch process completed: {completed}/{total}")
             
-            print(get_message_fallback("all_batches_completed_status"))
+            logger.info("✅ All batches processing completed")
             
         except Exception as e:
-            print(get_message_fallback("wait_process_error", error=str(e)))
+            logger.warning(f"⚠️  Error waiting for batch processes to complete: {str(e)}")
     
     def merge_final_results(self, state=None):
         """合并最终结果"""
         try:
-            self._ensure_config_loaded()
-            
-            # 重新加载最新的状态文件，确保获取到所有批次的最终状态
+            # 写入缓冲中的事件，再重新加载最新的状态文件，确保获取到所有批次的最终状态
+            self.flush_batch_events()
             if os.path.exists(self.state_file):
                 print(get_message_fallback("reload_state_file", file=self.state_file))
-                with open(self.state_file, 'r', encoding='utf-8') as f:
-                    latest_state = json.load(f)
+                latest_state = load_state_cached(self.state_file)
             else:
                 print(get_message_fallback("state_file_not_exist"))
                 latest_state = state
@@ -1045,14 +1504,15 @@ class ParallelScreeningManager:
             total_count = len(latest_state['batches'])
             print(get_message_fallback("batch_status_stats", completed=completed_count, total=total_count))
             
-            from result_merger import ResultMerger
-            
             output_directory = self.config['paths'].get(
                 'output_directory', 
                 os.path.dirname(self.config['paths']['input_xml_path'])
             )
             
-            merger = ResultMerger(output_directory)
+            merger = ResultMerger(
+                output_directory,
+                read_workers=self.config['parallel_settings'].get('merge_read_workers')
+            )
             results = merger.merge_batch_results(latest_state, backup_individual=True)
             
             if results.get('xml_merge', {}).get('success') or results.get('excel_merge', {}).get('success'):
@@ -1069,25 +1529,38 @@ class ParallelScreeningManager:
                 
         except Exception as e:
             print(f"❌ Final result merge failed: {str(e)}")
-            import traceback
             traceback.print_exc()
             return False
     
-    def save_state(self, state):
-        """保存状态到文件"""
-        try:
-            with open(self.state_file, 'w', encoding='utf-8') as f:
-                json.dump(state, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            print(get_message_fallback("save_state_failed", error=str(e)))
-    
     def cleanup_temp_files(self):
         """清理临时文件"""
         try:
             if os.path.exists(self.temp_dir):
-                shutil.rmtree(self.temp_dir)
-            if os.path.exists(self.state_file):
-                os.remove(self.state_file)
+                # 临时目录下基本都是平铺的批次文件，删除文件后再移除目录
+                file_paths = []
+                with os.scandir(self.temp_dir) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            shutil.rmtree(entry.path)
+                        else:
+                            file_paths.append(entry.path)
+                
+                # 批次文件较多时多线程并发删除（Windows上收益不大，仍逐个删除）
+                cleanup_workers = self.config['parallel_settings'].get('cleanup_workers') or CPU_COUNT
+                if os.name != 'nt' and cleanup_workers > 1 and len(file_paths) > cleanup_workers:
+                    with ThreadPoolExecutor(max_workers=cleanup_workers) as executor:
+                        for _ in executor.map(os.unlink, file_paths):
+                            pass
+                else:
+                    for path in file_paths:
+                        os.unlink(path)
+                os.rmdir(self.temp_dir)
+            self.flush_batch_events()
+            with state_file_lock(self.state_file):
+                if os.path.exists(self.state_file):
+                    os.remove(self.state_file)
+                reset_batch_events(self.state_file)
+            # 锁文件保留：解锁后再删除会让其他进程在新旧两个inode上各自加锁
             print(get_message_fallback("temp_cleanup_success"))
         except Exception as e:
             print(get_message_fallback("temp_cleanup_error", error=str(e)))
@@ -29,6 +29,7 @@ from parallel_controller import ParallelScreeningManager
 from progress_monitor import ProgressMonitor, monitor_screening_progress
 from simple_progress_monitor import start_simple_monitoring
 from result_merger import merge_results_from_state
+from state_store import reset_batch_events
 from i18n.i18n_manager import get_language_manager, get_message, select_language
 
 
@@ -150,12 +151,12 @@ def interactive_mode(lang_override=None):
             print(get_message('invalid_option'))
 
 
-def run_new_task(config_path):
+def run_new_task(config_path, ready_event=None):
     """Run new task"""
     try:
         print(get_message("starting_new_task"))
         
-        manager = ParallelScreeningManager(config_path)
+        manager = ParallelScreeningManager(config_path, ready_event=ready_event)
         success = manager.start_parallel_screening()
         
         return success
@@ -165,7 +166,7 @@ def run_new_task(config_path):
         return False
 
 
-def run_resume_task(config_path):
+def run_resume_task(config_path, ready_event=None):
     """Resume task"""
     try:
         print("🔄 Resuming interrupted parallel screening task...")
@@ -178,7 +179,7 @@ def run_resume_task(config_path):
         
         print(f"✓ Found state file: {state_file}")
         
-        manager = ParallelScreeningManager(config_path)
+        manager = ParallelScreeningManager(config_path, ready_event=ready_event)
         # Resume logic needs to be implemented here
         success = manager.start_parallel_screening()
         
@@ -261,6 +262,7 @@ def run_cleanup():
             choice = input(get_message("delete_state_file", file=state_file))
             if choice.lower() == 'y':
                 state_file.unlink()
+                reset_batch_events(str(state_file))
                 print(get_message("deleted_state_file", file=state_file))
         
         print(get_message("cleanup_completed"))
@@ -272,19 +274,16 @@ def run_cleanup():
 
 
 def run_with_monitor(task_func, state_file_pattern="parallel_screening_state.json", update_interval=10):
-    """Run task with simplified monitoring"""
+    """Run task with simplified monitoring
+    
+    task_func receives a threading.Event that the task sets once the state file is ready.
+    """
+    ready_event = threading.Event()
     
     def monitor_thread():
         """Monitor thread"""
-        # Wait for state file to be generated
-        max_wait = 30  # Wait max 30 seconds
-        wait_count = 0
-        
-        while wait_count < max_wait:
-            if os.path.exists(state_file_pattern):
-                break
-            time.sleep(1)
-            wait_count += 1
+        # Wait for the task to report the state file (max 30 seconds)
+        ready_event.wait(timeout=30)
         
         if os.path.exists(state_file_pattern):
             try:
@@ -304,7 +303,11 @@ def run_with_monitor(task_func, state_file_pattern="parallel_screening_state.jso
     monitor_t.start()
     
     # Execute main task
-    return task_func()
+    try:
+        return task_func(ready_event)
+    finally:
+        # Release the monitor thread if the task ended before creating the state file
+        ready_event.set()
 
 
 def main():
@@ -340,7 +343,7 @@ def main():
         elif args.resume:
             # Resume mode
             success = run_with_monitor(
-                lambda: run_resume_task(args.config),
+                lambda ready_event: run_resume_task(args.config, ready_event),
                 update_interval=args.update_interval
             )
             
@@ -350,12 +353,12 @@ def main():
             
             if mode == 'new':
                 success = run_with_monitor(
-                    lambda: run_new_task(args.config),
+                    lambda ready_event: run_new_task(args.config, ready_event),
                     update_interval=args.update_interval
                 )
             elif mode == 'resume':
                 success = run_with_monitor(
-                    lambda: run_resume_task(args.config),
+                    lambda ready_event: run_resume_task(args.config, ready_event),
                     update_interval=args.update_interval
                 )
             elif mode == 'monitor':
@@ -383,7 +386,7 @@ def main():
         else:
             # Default new task mode
             success = run_with_monitor(
-                lambda: run_new_task(args.config),
+                lambda ready_event: run_new_task(args.config, ready_event),
                 update_interval=args.update_interval
             )
         
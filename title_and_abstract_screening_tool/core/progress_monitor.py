@@ -5,23 +5,113 @@ Real-time monitoring of parallel screener processing progress
 """
 
 import os
+import sys
 import time
-import json
+import asyncio
+import functools
 import threading
-from datetime import datetime, timedelta
+from collections import namedtuple
+from datetime import datetime
 from pathlib import Path
 
+from state_store import event_log_path, load_state_cached
+
+# Resolve the i18n lookup once instead of importing it on every refresh
+try:
+    from i18n.i18n_manager import get_message
+except ImportError:
+    get_message = None
+
+try:
+    from watchfiles import Change, awatch
+except ImportError:
+    awatch = None
+
+# Batch counts by status plus records in completed batches
+BatchAggregate = namedtuple('BatchAggregate', 'completed running failed pending completed_records')
+
+# Everything one refresh derives from the batches, computed in a single pass and shared by all sections:
+# status aggregate, {batch_id: progress text} of running batches, and totals over completed batches
+# (duration and records of those with both timestamps, API calls of all)
+TickView = namedtuple(
+    'TickView',
+    'now aggregate running_progress completed_duration completed_timed_records completed_api_calls'
+)
+
+# Distinct timestamps remembered by _parse_timestamp (a few per batch)
+TIMESTAMP_CACHE_SIZE = 4096
+
+def _parse_timestamp(value):
+    """ISO timestamp -> epoch seconds (None when missing or malformed)"""
+    if not value:
+        return None
+    return _parse_iso_timestamp(value)
+
+@functools.lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def _parse_iso_timestamp(value):
+    """
+    Parse one ISO timestamp; memoized because every state reload repeats the timestamps of unchanged batches
+    
+    The producer writes naive local times (datetime.now().isoformat()), so the C fromisoformat parser is kept
+    and only a trailing 'Z' is rewritten, without scanning the whole string
+    """
+    try:
+        if value[-1] == 'Z':
+            value = value[:-1] + '+00:00'
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def _write_lines(lines):
+    """Write display lines to stdout in one call"""
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+# Terminal control sequences for redrawing the progress frame in place
+ALT_SCREEN_ON = "\x1b[?1049h"
+ALT_SCREEN_OFF = "\x1b[?1049l"
+CLEAR_SCREEN = "\x1b[2J"
+CURSOR_HOME = "\x1b[H"
+ERASE_TO_EOL = "\x1b[K"
+ERASE_BELOW = "\x1b[J"
+
+def _write_frame(lines):
+    """Overwrite the previous frame from the top-left corner in one write, erasing stale characters"""
+    sys.stdout.write(CURSOR_HOME + (ERASE_TO_EOL + "\n").join(lines) + ERASE_TO_EOL + "\n" + ERASE_BELOW)
+    sys.stdout.flush()
+
+# Progress bar segments built once and sliced on every refresh
+PROGRESS_BAR_WIDTH = 50
+FULL_BAR = "█" * PROGRESS_BAR_WIDTH
+EMPTY_BAR = "░" * PROGRESS_BAR_WIDTH
+
+# Seconds between display refreshes when the state has not changed (keeps runtime and ETA current)
+HOUSEKEEPING_INTERVAL = 10
+
 
 class ProgressMonitor:
     """Progress Monitor"""
     
-    def __init__(self, state_file_path, update_interval=5):
+    def __init__(self, state_file_path, update_interval=5, alternate_screen=False):
         self.state_file_path = state_file_path
         self.update_interval = update_interval
+        # Opt-in: only safe when nothing else writes to stdout while monitoring,
+        # since each frame erases other output and leaving the screen discards it
+        self.alternate_screen = alternate_screen
         self.is_monitoring = False
         self.monitor_thread = None
+        self._loop = None
+        self._main_task = None
+        self._redraw_in_place = False  # Frames overwrite each other on an alternate screen (TTY only)
+        self._watch_stop = None       # Ends the watchfiles watch from stop_monitoring
+        self._watching = False        # True while the watchfiles watch is running
         self.start_time = None
+        self._start_monotonic = None  # time.monotonic() at start, for elapsed runtime
         self.last_update_time = None
+        self._aggregate_cache = None  # (state, BatchAggregate) for the last parsed state
+        self._times_cache = None      # (batches, {batch_id: (start_ts, end_ts)}) for the last parsed state
+        self._latest_summary = None   # Summary published by the monitor thread at each refresh
+        self._completed_event = threading.Event()  # Set once no batch is running or pending
         
     def start_monitoring(self):
         """Start monitoring"""
@@ -30,46 +120,208 @@ class ProgressMonitor:
         
         self.is_monitoring = True
         self.start_time = datetime.now()
+        self._start_monotonic = time.monotonic()
         self.last_update_time = self.start_time
         
-        # Start monitoring thread
-        self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
-        self.monitor_thread.start()
+        # Run the watch and housekeeping tasks on an event loop in a background thread
+        self._loop = asyncio.new_event_loop()
+        self._watch_stop = threading.Event()
+        self._main_task = self._loop.create_task(self._run())
+        self.monitor_thread = threading.Thread(target=self._run_event_loop, daemon=True)
         
         print("📊 Progress monitoring started")
+        
+        # When enabled and on a terminal, draw frames in place on the alternate screen;
+        # otherwise frames are appended so batch logs and errors stay visible
+        self._redraw_in_place = self.alternate_screen and sys.stdout.isatty()
+        if self._redraw_in_place:
+            sys.stdout.write(ALT_SCREEN_ON + CLEAR_SCREEN + CURSOR_HOME)
+            sys.stdout.flush()
+        
+        self.monitor_thread.start()
     
     def stop_monitoring(self):
         """Stop monitoring"""
         self.is_monitoring = False
+        if self._loop is not None and self.monitor_thread.is_alive():
+            self._watch_stop.set()
+            self._loop.call_soon_threadsafe(self._stop_tasks)
         if self.monitor_thread:
             self.monitor_thread.join(timeout=5)
         
+        if self._redraw_in_place:
+            sys.stdout.write(ALT_SCREEN_OFF)
+            sys.stdout.flush()
+            self._redraw_in_place = False
+        
         print("📊 Progress monitoring stopped")
     
-    def _monitor_loop(self):
-        """Monitoring loop"""
-        while self.is_monitoring:
+    def _stop_tasks(self):
+        """
+        Runs on the monitor thread: let an active watch end through its stop event, cancel anything else
+        
+        Cancelling the watch would leave its watcher thread running native code after the loop closes,
+        which can crash the interpreter at exit; with the stop event it returns within one poll step
+        """
+        if not self._watching:
+            self._main_task.cancel()
+    
+    def _run_event_loop(self):
+        """Monitor thread: run the event loop until the monitoring tasks are cancelled"""
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._main_task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.run_until_complete(self._loop.shutdown_asyncgens())
+            self._loop.close()
+    
+    async def _run(self):
+        """Redraw on state file changes plus periodic housekeeping, or poll without watchfiles"""
+        if awatch is not None:
+            housekeeping = asyncio.ensure_future(self._housekeeping_loop())
             try:
-                self._update_progress_display()
-                time.sleep(self.update_interval)
-            except KeyboardInterrupt:
-                break
-            except Exception as e:
-                print(f"⚠️  Monitor update error: {str(e)}")
-                time.sleep(self.update_interval)
+                await self._file_watch_loop()
+            finally:
+                housekeeping.cancel()
+        else:
+            await self._monitor_loop()
+    
+    def _refresh_display(self):
+        """Redraw the progress display (both loops run on the monitor thread, so redraws never overlap)"""
+        try:
+            self._update_progress_display()
+        except Exception as e:
+            print(f"⚠️  Monitor update error: {str(e)}")
+    
+    async def _file_watch_loop(self):
+        """Redraw whenever the state snapshot or its batch event log is modified"""
+        # Match by file name: the snapshot is replaced atomically (write temp file, then rename),
+        # which is reported as the target being added; deletions (cleanup) are not redrawn
+        watched_names = {
+            os.path.basename(self.state_file_path),
+            os.path.basename(event_log_path(self.state_file_path))
+        }
+        
+        def is_state_change(change, path):
+            return change in (Change.added, Change.modified) and os.path.basename(path) in watched_names
+        
+        self._refresh_display()
+        self._watching = True
+        try:
+            async for _ in awatch(
+                os.path.dirname(os.path.abspath(self.state_file_path)),
+                watch_filter=is_state_change,
+                recursive=False,
+                stop_event=self._watch_stop
+            ):
+                self._refresh_display()
+        except Exception as e:
+            # Directory cannot be watched (e.g. removed or unsupported): keep polling instead
+            print(f"⚠️  State file watch unavailable, polling instead: {str(e)}")
+        finally:
+            self._watching = False
+        if not self._watch_stop.is_set():
+            await self._monitor_loop()
+    
+    async def _housekeeping_loop(self):
+        """Periodically redraw so runtime and remaining time estimates advance between state changes"""
+        while True:
+            await asyncio.sleep(HOUSEKEEPING_INTERVAL)
+            self._refresh_display()
+    
+    async def _monitor_loop(self):
+        """Monitoring loop (polling fallback)"""
+        while True:
+            self._refresh_display()
+            await asyncio.sleep(self.update_interval)
     
     def _load_current_state(self):
-        """Load current state"""
+        """Load current state (re-parsed only when the snapshot or event log changed; treat as read-only)"""
         try:
             if not os.path.exists(self.state_file_path):
                 return None
             
-            with open(self.state_file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return load_state_cached(self.state_file_path)
         except Exception as e:
             print(f"⚠️  Failed to read state file: {str(e)}")
             return None
     
+    @staticmethod
+    def _aggregate(batches):
+        """
+        Tally batch statuses and completed records in a single pass
+        
+        A plain loop is the fastest form here: dict subscripts with constant keys are specialized by the
+        interpreter, record_count is only read for completed batches, and nothing is allocated per batch
+        """
+        completed = running = failed = pending = completed_records = 0
+        for batch in batches:
+            status = batch['status']
+            if status == 'completed':
+                completed += 1
+                completed_records += batch.get('record_count', 0)
+            elif status == 'running':
+                running += 1
+            elif status == 'failed':
+                failed += 1
+            elif status == 'pending':
+                pending += 1
+        return BatchAggregate(completed, running, failed, pending, completed_records)
+    
+    def _state_aggregate(self, state):
+        """Aggregate of the given state, computed once per parsed state"""
+        cached = self._aggregate_cache
+        if cached is not None and cached[0] is state:
+            return cached[1]
+        aggregate = self._aggregate(state['batches'])
+        self._aggregate_cache = (state, aggregate)
+        return aggregate
+    
+    def _batch_times(self, batches):
+        """Start/end epoch seconds of each batch, parsed once per parsed state"""
+        cached = self._times_cache
+        if cached is not None and cached[0] is batches:
+            return cached[1]
+        times = {
+            batch['batch_id']: (
+                _parse_timestamp(batch.get('started_at')),
+                _parse_timestamp(batch.get('completed_at') or batch.get('failed_at'))
+            )
+            for batch in batches
+        }
+        self._times_cache = (batches, times)
+        return times
+    
+    def _compute_tick_view(self, batches, aggregate=None, now=None):
+        """Single pass over the batches for one refresh; the display sections only read the result"""
+        if aggregate is None:
+            aggregate = self._aggregate(batches)
+        if now is None:
+            now = time.time()
+        times = self._batch_times(batches)
+        running_progress = {}
+        completed_duration = 0.0
+        completed_timed_records = 0
+        completed_api_calls = 0
+        
+        if aggregate.running or aggregate.completed:
+            for batch in batches:
+                status = batch['status']
+                if status == 'running':
+                    batch_id = batch['batch_id']
+                    running_progress[batch_id] = self._calculate_accurate_progress(batch, times[batch_id][0], now)
+                elif status == 'completed':
+                    completed_api_calls += batch.get('api_calls', 0)
+                    start_ts, end_ts = times[batch['batch_id']]
+                    if start_ts is not None and end_ts is not None:
+                        completed_duration += end_ts - start_ts
+                        completed_timed_records += batch.get('record_count', 0)
+        
+        return TickView(now, aggregate, running_progress, completed_duration,
+                        completed_timed_records, completed_api_calls)
+    
     def _update_progress_display(self):
         """Update progress display"""
         state = self._load_current_state()
@@ -77,79 +329,99 @@ class ProgressMonitor:
             return
         
         current_time = datetime.now()
+        lines = []
         
-        # Only clear screen if we're in monitoring mode (not mixed with other outputs)
-        # Use a more gentle update approach
-        print("\n" + "="*80)
-        print("📊 Progress Update - " + current_time.strftime('%H:%M:%S'))
-        print("="*80)
+        # Appended frames are separated by a blank line; in-place frames start at the top
+        lines.append("="*80 if self._redraw_in_place else "\n" + "="*80)
+        lines.append("📊 Progress Update - " + current_time.strftime('%H:%M:%S'))
+        lines.append("="*80)
         
-        self._display_batch_progress_summary(state['batches'])
-        self._display_overall_progress(state, current_time)
+        aggregate = self._state_aggregate(state)
+        view = self._compute_tick_view(state['batches'], aggregate)
+        self._display_batch_progress_summary(state['batches'], view, lines)
+        self._display_overall_progress(state, current_time, view, lines)
         
+        # Publish the summary with a single attribute store; readers never see a partial dict
+        self._latest_summary = self._build_summary(state, aggregate)
         self.last_update_time = current_time
+        if aggregate.running == 0 and aggregate.pending == 0:
+            self._completed_event.set()
+        
+        # Emit the whole frame with a single write
+        if self._redraw_in_place:
+            _write_frame(lines)
+        else:
+            _write_lines(lines)
     
-    def _display_header(self, state, current_time):
+    def _display_header(self, state, current_time, out=None):
         """Display header information"""
-        print("=" * 80)
-        print("🎯 SmartEBM Parallel Screening Progress Monitor")
-        print("=" * 80)
-        print(f"Session ID: {state.get('session_id', 'unknown')}")
+        lines = [] if out is None else out
+        lines.append("=" * 80)
+        lines.append("🎯 SmartEBM Parallel Screening Progress Monitor")
+        lines.append("=" * 80)
+        lines.append(f"Session ID: {state.get('session_id', 'unknown')}")
         if self.start_time:
-            print(f"Start Time: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
+            lines.append(f"Start Time: {self.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
         else:
-            print(f"Start Time: Unknown")
-        print(f"Current Time: {current_time.strftime('%Y-%m-%d %H:%M:%S')}")
+            lines.append(f"Start Time: Unknown")
+        lines.append(f"Current Time: {current_time.strftime('%Y-%m-%d %H:%M:%S')}")
         
         if self.start_time:
-            elapsed = current_time - self.start_time
-            print(f"Runtime: {self._format_duration(elapsed)}")
+            lines.append(f"Runtime: {self._format_duration(self._elapsed_seconds())}")
         else:
-            print(f"Runtime: Unknown")
-        print("=" * 80)
+            lines.append(f"Runtime: Unknown")
+        lines.append("=" * 80)
+        
+        if out is None:
+            _write_lines(lines)
     
-    def _display_batch_progress_summary(self, batches):
+    def _display_batch_progress_summary(self, batches, view=None, out=None):
         """Display simplified batch progress summary"""
-        print("📋 Batch Status Summary:")
+        lines = [] if out is None else out
+        lines.append("📋 Batch Status Summary:")
         
         # Count by status
-        status_counts = {'pending': 0, 'running': 0, 'completed': 0, 'failed': 0}
-        running_batches = []
-        
-        for batch in batches:
-            status = batch['status']
-            if status in status_counts:
-                status_counts[status] += 1
-            
-            if status == 'running':
-                progress = self._calculate_accurate_progress(batch)
-                running_batches.append(f"Batch {batch['batch_id']}: {progress}")
+        if view is None:
+            view = self._compute_tick_view(batches)
+        aggregate = view.aggregate
+        running_batches = [
+            f"Batch {batch_id}: {progress}" for batch_id, progress in view.running_progress.items()
+        ]
         
         # Display status summary
-        print(f"  ✅ Completed: {status_counts['completed']}")
-        print(f"  🔄 Running: {status_counts['running']}")
-        print(f"  ⏳ Pending: {status_counts['pending']}")
-        print(f"  ❌ Failed: {status_counts['failed']}")
+        lines.append(f"  ✅ Completed: {aggregate.completed}")
+        lines.append(f"  🔄 Running: {aggregate.running}")
+        lines.append(f"  ⏳ Pending: {aggregate.pending}")
+        lines.append(f"  ❌ Failed: {aggregate.failed}")
         
         # Show running batch details
         if running_batches:
-            print("  Running Details:")
+            lines.append("  Running Details:")
             for batch_info in running_batches:
-                print(f"    {batch_info}")
+                lines.append(f"    {batch_info}")
+        
+        if out is None:
+            _write_lines(lines)
     
-    def _display_batch_progress(self, batches):
+    def _display_batch_progress(self, batches, out=None, view=None):
         """Display detailed batch progress (for full screen mode only)"""
-        print("\n📋 Batch Progress Details")
-        print("-" * 80)
+        lines = [] if out is None else out
+        lines.append("\n📋 Batch Progress Details")
+        lines.append("-" * 80)
         
         # Table header
         header = (f"{'Batch':<6} {'Record Range':<15} {'Status':<12} {'Progress':<8} "
                  f"{'Start Time':<12} {'Duration':<10}")
-        print(header)
-        print("-" * 80)
+        lines.append(header)
+        lines.append("-" * 80)
         
+        if view is None:
+            view = self._compute_tick_view(batches)
+        times = self._batch_times(batches)
+        now = view.now
         for batch in batches:
             batch_id = batch['batch_id']
+            start_ts, end_ts = times[batch_id]
             record_range = f"{batch['start_record']}-{batch['end_record']}"
             status = batch['status']
             
@@ -167,31 +439,27 @@ class ProgressMonitor:
             if status == 'completed':
                 progress = "100%"
             elif status == 'running':
-                progress = self._calculate_accurate_progress(batch)
+                progress = view.running_progress[batch_id]
             else:
                 progress = "0%"
             
             # Time information
             start_time = batch.get('started_at', '')
-            if start_time:
-                try:
-                    start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-                    start_display = start_dt.strftime('%H:%M:%S')
-                    
-                    if status in ['completed', 'failed']:
-                        end_time = batch.get('completed_at', batch.get('failed_at', ''))
-                        if end_time:
-                            end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-                            duration = self._format_duration(end_dt - start_dt)
-                        else:
-                            duration = "Unknown"
-                    elif status == 'running':
-                        duration = self._format_duration(datetime.now() - start_dt)
+            if start_ts is not None:
+                start_display = time.strftime('%H:%M:%S', time.localtime(start_ts))
+                
+                if status in ['completed', 'failed']:
+                    if end_ts is not None:
+                        duration = self._format_duration(end_ts - start_ts)
                     else:
-                        duration = "-"
-                except:
-                    start_display = start_time[:8] if len(start_time) > 8 else start_time
+                        duration = "Unknown"
+                elif status == 'running':
+                    duration = self._format_duration(now - start_ts)
+                else:
                     duration = "-"
+            elif start_time:
+                start_display = start_time[:8] if len(start_time) > 8 else start_time
+                duration = "-"
             else:
                 start_display = "-"
                 duration = "-"
@@ -199,121 +467,123 @@ class ProgressMonitor:
             # Display row
             row = (f"{batch_id:<6} {record_range:<15} {status_display:<12} "
                   f"{progress:<8} {start_display:<12} {duration:<10}")
-            print(row)
+            lines.append(row)
         
-        print("-" * 80)
+        lines.append("-" * 80)
+        
+        if out is None:
+            _write_lines(lines)
     
-    def _display_overall_progress(self, state, current_time):
+    def _display_overall_progress(self, state, current_time, view=None, out=None):
         """Display overall progress"""
+        lines = [] if out is None else out
         batches = state['batches']
         total_batches = len(batches)
         
-        completed_batches = sum(1 for b in batches if b['status'] == 'completed')
-        running_batches = sum(1 for b in batches if b['status'] == 'running')
-        failed_batches = sum(1 for b in batches if b['status'] == 'failed')
-        pending_batches = sum(1 for b in batches if b['status'] == 'pending')
+        if view is None:
+            view = self._compute_tick_view(batches, self._state_aggregate(state))
+        aggregate = view.aggregate
+        completed_batches = aggregate.completed
+        running_batches = aggregate.running
+        failed_batches = aggregate.failed
+        pending_batches = aggregate.pending
         
         # Calculate record progress
         total_records = state.get('total_records', 0)
-        completed_records = sum(b.get('record_count', 0) for b in batches 
-                              if b['status'] == 'completed')
+        completed_records = aggregate.completed_records
         
         batch_progress = (completed_batches / total_batches) * 100 if total_batches > 0 else 0
         record_progress = (completed_records / total_records) * 100 if total_records > 0 else 0
         
-        try:
-            from i18n.i18n_manager import get_message
-            print(f"\n{get_message('overall_progress')}")
-            print("-" * 40)
-            print(get_message("total_batches", count=total_batches))
-            print(get_message("completed_batches", count=completed_batches, percent=batch_progress))
-            print(get_message("running_batches", count=running_batches))
-            print(get_message("failed_batches", count=failed_batches))
-            print(get_message("pending_batches", count=pending_batches))
-            print()
-            print(get_message("total_records", count=total_records))
-            print(get_message("processed_records", count=completed_records, percent=record_progress))
-        except:
-            print(f"\n📊 Overall Progress")
-            print("-" * 40)
-            print(f"Total Batches: {total_batches}")
-            print(f"Completed: {completed_batches} ({batch_progress:.1f}%)")
-            print(f"Running: {running_batches}")
-            print(f"Failed: {failed_batches}")
-            print(f"Pending: {pending_batches}")
-            print()
-            print(f"Total Records: {total_records}")
-            print(f"Processed Records: {completed_records} ({record_progress:.1f}%)")
+        if get_message is not None:
+            lines.append(f"\n{get_message('overall_progress')}")
+            lines.append("-" * 40)
+            lines.append(get_message("total_batches", count=total_batches))
+            lines.append(get_message("completed_batches", count=completed_batches, percent=batch_progress))
+            lines.append(get_message("running_batches", count=running_batches))
+            lines.append(get_message("failed_batches", count=failed_batches))
+            lines.append(get_message("pending_batches", count=pending_batches))
+            lines.append("")
+            lines.append(get_message("total_records", count=total_records))
+            lines.append(get_message("processed_records", count=completed_records, percent=record_progress))
+        else:
+            lines.append(f"\n📊 Overall Progress")
+            lines.append("-" * 40)
+            lines.append(f"Total Batches: {total_batches}")
+            lines.append(f"Completed: {completed_batches} ({batch_progress:.1f}%)")
+            lines.append(f"Running: {running_batches}")
+            lines.append(f"Failed: {failed_batches}")
+            lines.append(f"Pending: {pending_batches}")
+            lines.append("")
+            lines.append(f"Total Records: {total_records}")
+            lines.append(f"Processed Records: {completed_records} ({record_progress:.1f}%)")
         
         # Progress bar
-        self._display_progress_bar(record_progress)
+        self._display_progress_bar(record_progress, out=lines)
         
         # Estimate remaining time
         if running_batches > 0 or pending_batches > 0:
-            eta = self._estimate_remaining_time(state, current_time)
+            eta = self._estimate_remaining_time(state, current_time, view)
             if eta:
-                print(f"Estimated Remaining Time: {eta}")
+                lines.append(f"Estimated Remaining Time: {eta}")
+        
+        if out is None:
+            _write_lines(lines)
     
-    def _display_performance_stats(self, state, current_time):
+    def _display_performance_stats(self, state, current_time, out=None, view=None):
         """Display performance statistics"""
-        batches = state['batches']
-        completed_batches = [b for b in batches if b['status'] == 'completed']
-        
-        if not completed_batches:
+        lines = [] if out is None else out
+        if view is None:
+            view = self._compute_tick_view(state['batches'], self._state_aggregate(state))
+        if not view.aggregate.completed:
             return
         
-        print(f"\n⚡ Performance Statistics")
-        print("-" * 40)
+        lines.append(f"\n⚡ Performance Statistics")
+        lines.append("-" * 40)
         
-        # Calculate average processing time
-        total_duration = timedelta(0)
-        total_records = 0
-        
-        for batch in completed_batches:
-            start_time = batch.get('started_at')
-            end_time = batch.get('completed_at')
-            
-            if start_time and end_time:
-                try:
-                    start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-                    end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-                    duration = end_dt - start_dt
-                    total_duration += duration
-                    total_records += batch.get('record_count', 0)
-                except:
-                    continue
+        # Average processing time (seconds) and API calls over completed batches
+        total_duration = view.completed_duration
+        total_records = view.completed_timed_records
+        api_calls = view.completed_api_calls
         
         if total_records > 0:
-            avg_time_per_record = total_duration.total_seconds() / total_records
+            avg_time_per_record = total_duration / total_records
             records_per_minute = 60 / avg_time_per_record if avg_time_per_record > 0 else 0
             
-            print(f"Average Processing Time: {avg_time_per_record:.2f} sec/record")
-            print(f"Processing Speed: {records_per_minute:.1f} records/min")
+            lines.append(f"Average Processing Time: {avg_time_per_record:.2f} sec/record")
+            lines.append(f"Processing Speed: {records_per_minute:.1f} records/min")
         
         # API使用统计（如果有的话）
-        api_calls = sum(batch.get('api_calls', 0) for batch in completed_batches)
         if api_calls > 0:
-            elapsed_minutes = (current_time - self.start_time).total_seconds() / 60
+            elapsed_minutes = self._elapsed_seconds() / 60
             api_rate = api_calls / elapsed_minutes if elapsed_minutes > 0 else 0
-            print(f"Total API Calls: {api_calls}")
-            try:
-                from i18n.i18n_manager import get_message
-                print(get_message("api_call_rate", rate=api_rate))
-            except:
-                print(f"API Call Rate: {api_rate:.1f} calls/minute")
+            lines.append(f"Total API Calls: {api_calls}")
+            if get_message is not None:
+                lines.append(get_message("api_call_rate", rate=api_rate))
+            else:
+                lines.append(f"API Call Rate: {api_rate:.1f} calls/minute")
+        
+        if out is None:
+            _write_lines(lines)
     
-    def _display_progress_bar(self, percentage, width=50):
+    def _display_progress_bar(self, percentage, width=PROGRESS_BAR_WIDTH, out=None):
         """显示进度条"""
-        filled = int(width * percentage / 100)
-        bar = "█" * filled + "░" * (width - filled)
-        try:
-            from i18n.i18n_manager import get_message
-            print(f"\n{get_message('progress_bar', bar=bar, percent=percentage)}")
-        except:
-            print(f"\nProgress: [{bar}] {percentage:.1f}%")
+        lines = [] if out is None else out
+        filled = min(max(int(width * percentage / 100), 0), width)
+        if width <= PROGRESS_BAR_WIDTH:
+            bar = FULL_BAR[:filled] + EMPTY_BAR[:width - filled]
+        else:
+            bar = "█" * filled + "░" * (width - filled)
+        if get_message is not None:
+            lines.append(f"\n{get_message('progress_bar', bar=bar, percent=percentage)}")
+        else:
+            lines.append(f"\nProgress: [{bar}] {percentage:.1f}%")
+        
+        if out is None:
+            _write_lines(lines)
     
-    def _calculate_accurate_progress(self, batch):
-        """计算更准确的批次进度"""
+    def _calculate_accurate_progress(self, batch, start_ts=None, now=None):
+        """计算更准确的批次进度（start_ts为预先解析的开始时间戳，now为本次刷新的time.time()）"""
         # 优先使用实际记录进度
         if 'current_record' in batch and 'record_count' in batch:
             current = batch.get('current_record', 0)
@@ -334,9 +604,11 @@ class ProgressMonitor:
             return "0%"
         
         try:
-            start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            elapsed = datetime.now() - start_dt
-            elapsed_minutes = elapsed.total_seconds() / 60
+            if start_ts is None:
+                start_ts = _parse_timestamp(start_time)
+                if start_ts is None:
+                    return "运行中"
+            elapsed_minutes = ((now or time.time()) - start_ts) / 60
             
             # 基于记录数量的动态估算（每条记录0.5-2分钟）
             record_count = batch.get('record_count', 1)
@@ -358,37 +630,21 @@ class ProgressMonitor:
         """估算单个批次的进度（保持向后兼容）"""
         return self._calculate_accurate_progress(batch)
     
-    def _estimate_remaining_time(self, state, current_time):
-        """估算剩余时间"""
+    def _estimate_remaining_time(self, state, current_time, view=None):
+        """估算剩余时间（view为本次刷新已计算的批次汇总）"""
         try:
-            batches = state['batches']
-            completed_batches = [b for b in batches if b['status'] == 'completed']
+            if view is None:
+                view = self._compute_tick_view(state['batches'], self._state_aggregate(state))
+            aggregate = view.aggregate
             
-            if len(completed_batches) < 2:
+            if aggregate.completed < 2:
                 return None
             
-            # 计算平均批次处理时间
-            total_duration = timedelta(0)
-            for batch in completed_batches:
-                start_time = batch.get('started_at')
-                end_time = batch.get('completed_at')
-                
-                if start_time and end_time:
-                    try:
-                        start_dt = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-                        end_dt = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-                        total_duration += (end_dt - start_dt)
-                    except:
-                        continue
-            
-            if len(completed_batches) == 0:
-                return None
-            
-            avg_batch_time = total_duration / len(completed_batches)
+            # 计算平均批次处理时间（秒）
+            avg_batch_time = view.completed_duration / aggregate.completed
             
             # 计算剩余批次
-            remaining_batches = sum(1 for b in batches 
-                                  if b['status'] in ['pending', 'running'])
+            remaining_batches = aggregate.pending + aggregate.running
             
             # 估算剩余时间
             estimated_remaining = avg_batch_time * remaining_batches
@@ -398,12 +654,13 @@ class ProgressMonitor:
         except Exception as e:
             return None
     
-    def _format_duration(self, duration):
-        """格式化时间间隔"""
-        if isinstance(duration, timedelta):
-            total_seconds = int(duration.total_seconds())
-        else:
-            total_seconds = int(duration)
+    def _elapsed_seconds(self):
+        """监控开始至今的秒数（单调时钟，不受系统时间调整影响）"""
+        return time.monotonic() - self._start_monotonic
+    
+    def _format_duration(self, seconds):
+        """格式化时间间隔（秒）"""
+        total_seconds = int(seconds)
         
         hours = total_seconds // 3600
         minutes = (total_seconds % 3600) // 60
@@ -414,22 +671,31 @@ class ProgressMonitor:
         else:
             return f"{minutes}:{seconds:02d}"
     
+    def wait_for_completion(self, timeout=None):
+        """Block until the monitor thread observes that all batches have finished; False on timeout"""
+        return self._completed_event.wait(timeout)
+    
     def get_summary_report(self):
-        """获取摘要报告"""
+        """获取摘要报告（监控运行时直接返回监控线程最近一次发布的摘要，不再读取状态文件）"""
+        summary = self._latest_summary
+        if self.is_monitoring and summary is not None:
+            return dict(summary, current_time=datetime.now())
+        
         state = self._load_current_state()
         if not state:
             return None
-        
-        batches = state['batches']
-        total_batches = len(batches)
-        completed = sum(1 for b in batches if b['status'] == 'completed')
-        failed = sum(1 for b in batches if b['status'] == 'failed')
-        running = sum(1 for b in batches if b['status'] == 'running')
-        pending = sum(1 for b in batches if b['status'] == 'pending')
+        return self._build_summary(state, self._state_aggregate(state))
+    
+    def _build_summary(self, state, aggregate):
+        """由状态和批次汇总构造摘要报告"""
+        total_batches = len(state['batches'])
+        completed = aggregate.completed
+        failed = aggregate.failed
+        running = aggregate.running
+        pending = aggregate.pending
         
         total_records = state.get('total_records', 0)
-        completed_records = sum(b.get('record_count', 0) for b in batches 
-                              if b['status'] == 'completed')
+        completed_records = aggregate.completed_records
         
         return {
             'session_id': state.get('session_id'),
@@ -446,56 +712,56 @@ class ProgressMonitor:
         }
 
 
-def monitor_screening_progress(state_file_path, update_interval=5):
+def monitor_screening_progress(state_file_path, update_interval=5, alternate_screen=False):
     """
     监控筛选进度的便捷函数
     
     Args:
         state_file_path (str): 状态文件路径
         update_interval (int): 更新间隔（秒）
+        alternate_screen (bool): 是否在终端备用屏幕上原地刷新（仅在监控是唯一输出时使用）
     """
-    monitor = ProgressMonitor(state_file_path, update_interval)
+    monitor = ProgressMonitor(state_file_path, update_interval, alternate_screen)
+    completed = False
+    interrupted = False
     
     try:
         monitor.start_monitoring()
         
-        # 保持监控直到用户中断
-        while True:
-            time.sleep(1)
-            
-            # 检查是否所有任务完成
-            summary = monitor.get_summary_report()
-            if summary:
-                if (summary['running_batches'] == 0 and 
-                    summary['pending_batches'] == 0):
-                    try:
-                        from i18n.i18n_manager import get_message
-                        print(f"\n{get_message('all_batches_completed')}")
-                    except:
-                        print("\n✅ All batches processing completed!")
-                    break
+        # 等待监控线程发出完成信号，不再每秒读取状态文件；
+        # 分段等待只是为了在Windows上也能响应Ctrl+C
+        while not monitor.wait_for_completion(timeout=1):
+            pass
+        completed = True
     
     except KeyboardInterrupt:
-        try:
-            from i18n.i18n_manager import get_message
-            print(f"\n{get_message('monitoring_interrupted')}")
-        except:
-            print("\n⚠️  Monitoring interrupted by user")
+        interrupted = True
     
     finally:
         monitor.stop_monitoring()
         
+        # 停止监控（离开备用屏幕）后再输出，避免提示被覆盖
+        if completed:
+            if get_message is not None:
+                print(f"\n{get_message('all_batches_completed')}")
+            else:
+                print("\n✅ All batches processing completed!")
+        elif interrupted:
+            if get_message is not None:
+                print(f"\n{get_message('monitoring_interrupted')}")
+            else:
+                print("\n⚠️  Monitoring interrupted by user")
+        
         # 显示最终摘要
         summary = monitor.get_summary_report()
         if summary:
-            try:
-                from i18n.i18n_manager import get_message
+            if get_message is not None:
                 print(f"\n{get_message('final_summary')}")
                 print(get_message("total_batches", count=summary['total_batches']))
                 print(get_message("completed_batches", count=summary['completed_batches'], percent=0))
                 print(get_message("failed_batches", count=summary['failed_batches']))
                 print(get_message("progress_percent", percent=summary['progress_percentage']))
-            except:
+            else:
                 print(f"\n📊 Final Summary:")
                 print(f"Total Batches: {summary['total_batches']}")
                 print(f"Completed: {summary['completed_batches']}")
@@ -504,22 +770,18 @@ def monitor_screening_progress(state_file_path, update_interval=5):
 
 
 if __name__ == "__main__":
-    import sys
-    
     if len(sys.argv) < 2:
-        try:
-            from i18n.i18n_manager import get_message
+        if get_message is not None:
             print(get_message("monitor_usage"))
-        except:
+        else:
             print("Usage: python progress_monitor.py <state_file_path> [update_interval]")
         sys.exit(1)
     
     state_file = sys.argv[1]
     interval = int(sys.argv[2]) if len(sys.argv) > 2 else 5
     
-    try:
-        from i18n.i18n_manager import get_message
+    if get_message is not None:
         print(get_message("start_monitoring", file=state_file))
-    except:
+    else:
         print(f"🔍 Starting monitoring: {state_file}")
     monitor_screening_progress(state_file, interval)
\ No newline at end of file
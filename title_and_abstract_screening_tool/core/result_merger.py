@@ -5,38 +5,231 @@
 """
 
 import os
+import multiprocessing as mp
+import numpy as np
 import pandas as pd
+from openpyxl import Workbook, load_workbook
 import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime
 from pathlib import Path
-import json
+from types import MappingProxyType
+from xml.sax.saxutils import quoteattr
 import shutil
 
+try:
+    import lxml.etree as LET
+except ImportError:
+    LET = None
+
+# 没有lxml时用标准库解析（Python 3中即为C加速实现），优先经defusedxml：禁止实体展开与外部引用
+try:
+    from defusedxml.ElementTree import iterparse as _safe_iterparse, parse as _safe_parse
+except ImportError:
+    _safe_iterparse = ET.iterparse
+    _safe_parse = ET.parse
+
+# token统计CSV优先用pyarrow读写（列式缓冲，多线程解析），否则回退到pandas
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+
+from state_store import load_state
+
+# i18n模块不可用时使用的英文消息，模块级只读常量
+FALLBACK_MESSAGES = MappingProxyType({
+    "xml_merge_start": "📄 Starting XML file merge...",
+    "files_to_merge": "Files to merge: {count}",
+    "processing_file": "  Processing file {current}/{total}: {filename}",
+    "xml_merge_completed": "✓ XML merge completed: {count} records",
+    "xml_output_file": "✓ Output file: {path}",
+    "xml_merge_failed": "❌ XML merge failed: {error}",
+    "excel_merge_start": "📊 Starting Excel file merge...",
+    "excel_processing_file": "  Processing file {current}/{total}: {filename}",
+})
+
+# 消息查找函数在导入时确定一次，合并循环中直接调用
+try:
+    from i18n.i18n_manager import get_message
+except ImportError:
+    def get_message(key, **kwargs):
+        """i18n模块不可用时的回退：格式化FALLBACK_MESSAGES中的英文消息"""
+        return FALLBACK_MESSAGES[key].format(**kwargs)
+
+# lxml解析选项：支持超大文本节点，不展开实体、不访问网络
+LXML_PARSE_OPTIONS = {'huge_tree': True, 'resolve_entities': False, 'no_network': True}
+
+# 合并后XML每级缩进
+XML_INDENT = "  "
+
+# 并发读取批次文件的默认线程/进程数上限
+MAX_MERGE_READ_WORKERS = 8
+
+# 批次XML文件达到此数量才用多进程解析（进程启动开销只在文件较多时值得）
+PARALLEL_XML_MERGE_MIN_FILES = 4
+
+
+def _merge_process_context():
+    """
+    XML解析进程的启动上下文
+    
+    与筛选进程池一致，优先使用forkserver，不支持的平台回退到spawn；
+    不使用Linux默认的fork，避免在持有日志线程和锁的主进程中直接fork
+    """
+    if 'forkserver' in mp.get_all_start_methods():
+        return mp.get_context('forkserver')
+    return mp.get_context('spawn')
+
+
+def read_excel_sheet(file_path):
+    """
+    以只读模式逐行读取工作簿第一个工作表（首行为表头），返回DataFrame
+    
+    openpyxl只读模式按行流式解析，不建立完整的单元格对象模型
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+        columns = [name if name is not None else f"Unnamed: {i}" for i, name in enumerate(header)]
+        return pd.DataFrame(rows, columns=columns)
+    finally:
+        wb.close()
+
+
+def write_excel_sheet(df, file_path):
+    """以只写模式逐行写出DataFrame（含表头，不含索引），单元格不在内存中保留"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append([str(column) for column in df.columns])
+    # 缺失值写为空单元格
+    values = df.astype(object).where(df.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        ws.append(row)
+    wb.save(file_path)
+
+
+def read_token_csv(file_path):
+    """
+    读取批次token统计CSV：有pyarrow时返回Table，否则返回DataFrame
+    
+    标题、摘要字段可能含换行；timestamp保持原始字符串，不推断为时间类型
+    """
+    if pa is not None:
+        return pacsv.read_csv(
+            file_path,
+            parse_options=pacsv.ParseOptions(newlines_in_values=True),
+            convert_options=pacsv.ConvertOptions(column_types={'timestamp': pa.string()})
+        )
+    return pd.read_csv(file_path)
+
+
+def write_token_csv(tables, file_path):
+    """按顺序拼接各批次的token统计并写出CSV，返回记录字典列表（供成本计算使用）"""
+    if pa is not None:
+        merged = pa.concat_tables(tables, promote_options='default')
+        pacsv.write_csv(merged, str(file_path))
+        return merged.to_pylist()
+    merged_df = pd.concat(tables, ignore_index=True)
+    merged_df.to_csv(file_path, index=False)
+    return merged_df.to_dict('records')
+
+
+def _has_namespaced_names(container_path):
+    """容器元素的标签或属性是否带命名空间（手工写出开始标签时无法处理前缀映射）"""
+    return any(tag.startswith('{') or any(name.startswith('{') for name in attrib)
+               for tag, attrib in container_path)
+
+
+def _container_tags(container_path):
+    """records容器及其各级父元素的开始标签和结束标签文本（逐级缩进，各占一行）"""
+    opening = []
+    closing = []
+    for level, (tag, attrib) in enumerate(container_path):
+        attributes = "".join(f" {name}={quoteattr(value)}" for name, value in attrib.items())
+        opening.append(f"{XML_INDENT * level}<{tag}{attributes}>\n")
+        closing.append(f"{XML_INDENT * level}</{tag}>\n")
+    return "".join(opening), "".join(reversed(closing))
+
+
+def serialize_xml_records(file_path, depth, pretty_print=False):
+    """
+    解析一个批次XML文件，把其中的<record>逐条序列化为UTF-8字节（每条一行，按depth缩进）
+    
+    在合并的工作进程中执行；返回 (字节, 记录数)
+    """
+    indent = (XML_INDENT * depth).encode('utf-8')
+    chunks = []
+    count = 0
+    
+    if LET is not None:
+        for _, record in LET.iterparse(file_path, events=('end',), tag='record',
+                                       remove_blank_text=True, **LXML_PARSE_OPTIONS):
+            if pretty_print:
+                LET.indent(record, space=XML_INDENT, level=depth)
+            chunks += (indent, LET.tostring(record, encoding='utf-8', with_tail=False), b"\n")
+            count += 1
+            record.clear()
+            while record.getprevious() is not None:
+                del record.getparent()[0]
+        return b"".join(chunks), count
+    
+    parents = []
+    for event, elem in _safe_iterparse(file_path, events=('start', 'end')):
+        if event == 'start':
+            parents.append(elem)
+            continue
+        parents.pop()
+        if elem.tag != 'record':
+            continue
+        elem.tail = None
+        if pretty_print:
+            ET.indent(elem, space=XML_INDENT, level=depth)
+        chunks += (indent, ET.tostring(elem, encoding='unicode').encode('utf-8'), b"\n")
+        count += 1
+        if parents:
+            parents[-1].remove(elem)
+    return b"".join(chunks), count
+
+
+def _read_excel_or_error(file_path):
+    """读取单个批次Excel文件；失败时返回异常而不抛出，由调用方按文件顺序报告"""
+    try:
+        return read_excel_sheet(file_path)
+    except Exception as e:
+        return e
+
 
 class ResultMerger:
     """结果合并器"""
     
-    def __init__(self, output_directory, final_output_prefix="final_results"):
+    def __init__(self, output_directory, final_output_prefix="final_results", read_workers=None):
         self.output_directory = Path(output_directory)
         self.final_output_prefix = final_output_prefix
+        # 并发读取批次文件的线程数（Excel）与进程数（XML）；None表示文件数与MAX_MERGE_READ_WORKERS中的较小值，1表示逐个读取
+        self.read_workers = read_workers
         self.output_directory.mkdir(parents=True, exist_ok=True)
         
-    def merge_xml_files(self, xml_file_paths, output_xml_path):
+    def merge_xml_files(self, xml_file_paths, output_xml_path, pretty_print=False):
         """
         合并多个XML文件，保持记录顺序
         
+        记录逐条流式写出，内存中同时只保留一条记录
+        
         Args:
             xml_file_paths (list): XML文件路径列表，按批次顺序排列
             output_xml_path (str): 输出XML文件路径
+            pretty_print (bool): 是否缩进每条记录的内部元素（默认每条记录写成一行，输出更小、更快）
         """
         try:
-            try:
-                from i18n.i18n_manager import get_message
-                print(f"\n{get_message('xml_merge_start')}")
-                print(get_message("files_to_merge", count=len(xml_file_paths)))
-            except:
-                print(f"\n📄 Starting XML file merge...")
-                print(f"Files to merge: {len(xml_file_paths)}")
+            print(f"\n{get_message('xml_merge_start')}")
+            print(get_message("files_to_merge", count=len(xml_file_paths)))
             
             # 检查所有文件是否存在
             missing_files = []
@@ -47,53 +240,18 @@ class ResultMerger:
             if missing_files:
                 raise FileNotFoundError(f"以下文件不存在: {missing_files}")
             
-            # 解析第一个文件作为基础结构
-            first_file = xml_file_paths[0]
-            tree = ET.parse(first_file)
-            root = tree.getroot()
-            
-            # 获取records容器
-            records_container = root.find('.//records')
-            if records_container is None:
-                # 如果没有records容器，创建一个
-                records_container = ET.SubElement(root, 'records')
+            merge_workers = self.read_workers or min(MAX_MERGE_READ_WORKERS, len(xml_file_paths))
+            if merge_workers > 1 and len(xml_file_paths) >= PARALLEL_XML_MERGE_MIN_FILES:
+                total_merged_records = self._parallel_merge_xml(
+                    xml_file_paths, output_xml_path, pretty_print, merge_workers
+                )
+            elif LET is not None:
+                total_merged_records = self._stream_merge_xml(xml_file_paths, output_xml_path, pretty_print)
             else:
-                # 清空现有记录
-                records_container.clear()
-            
-            total_merged_records = 0
-            
-            # 按顺序合并所有文件的记录
-            for i, file_path in enumerate(xml_file_paths, 1):
-                try:
-                    from i18n.i18n_manager import get_message
-                    print(get_message("processing_file", current=i, total=len(xml_file_paths), filename=os.path.basename(file_path)))
-                except:
-                    print(f"  Processing file {i}/{len(xml_file_paths)}: {os.path.basename(file_path)}")
-                
-                # 解析当前文件
-                current_tree = ET.parse(file_path)
-                current_root = current_tree.getroot()
-                
-                # 获取当前文件的records
-                current_records = current_root.findall('.//record')
-                
-                # 将记录添加到主文件
-                for record in current_records:
-                    records_container.append(record)
-                    total_merged_records += 1
-            
-            # 保存合并后的文件
-            ET.indent(tree, space="  ", level=0)  # 格式化XML
-            tree.write(output_xml_path, encoding='utf-8', xml_declaration=True)
+                total_merged_records = self._etree_stream_merge_xml(xml_file_paths, output_xml_path, pretty_print)
             
-            try:
-                from i18n.i18n_manager import get_message
-                print(get_message("xml_merge_completed", count=total_merged_records))
-                print(get_message("xml_output_file", path=output_xml_path))
-            except:
-                print(f"✓ XML merge completed: {total_merged_records} records")
-                print(f"✓ Output file: {output_xml_path}")
+            print(get_message("xml_merge_completed", count=total_merged_records))
+            print(get_message("xml_output_file", path=output_xml_path))
             
             return {
                 'success': True,
@@ -102,16 +260,198 @@ class ResultMerger:
             }
             
         except Exception as e:
-            try:
-                from i18n.i18n_manager import get_message
-                print(get_message("xml_merge_failed", error=str(e)))
-            except:
-                print(f"❌ XML merge failed: {str(e)}")
+            print(get_message("xml_merge_failed", error=str(e)))
             return {
                 'success': False,
                 'error': str(e)
             }
     
+    def _print_merge_progress(self, current, total, file_path):
+        """输出当前正在合并的XML文件"""
+        print(get_message("processing_file", current=current, total=total, filename=os.path.basename(file_path)))
+    
+    def _records_container_path(self, xml_path):
+        """
+        读取第一个文件开头，得到records容器及其各级父元素 [(标签, 属性), ...]（根元素在前）和根元素的命名空间
+        
+        读到<records>（或第一条<record>）即停止；没有records容器时在根元素下新建一个
+        """
+        path = []
+        nsmap = None
+        if LET is not None:
+            events = LET.iterparse(xml_path, events=('start', 'end'), **LXML_PARSE_OPTIONS)
+        else:
+            events = _safe_iterparse(xml_path, events=('start', 'end'))
+        for event, elem in events:
+            if event == 'end':
+                path.pop()
+                continue
+            if nsmap is None:
+                nsmap = dict(getattr(elem, 'nsmap', {}))
+            if path and elem.tag == 'records':
+                path.append((elem.tag, dict(elem.attrib)))
+                return path, nsmap
+            if elem.tag == 'record':
+                break
+            path.append((elem.tag, dict(elem.attrib)))
+        
+        return path[:1] + [('records', {})], nsmap
+    
+    def _stream_merge_xml(self, xml_file_paths, output_xml_path, pretty_print=False):
+        """
+        用lxml流式合并：逐条读取各文件的<record>并直接写入输出文件
+        
+        不构建任何文件的完整DOM，内存占用与批次数量和文件大小无关；返回合并的记录数
+        """
+        container_path, nsmap = self._records_container_path(xml_file_paths[0])
+        depth = len(container_path)
+        total_merged_records = 0
+        
+        with LET.xmlfile(output_xml_path, encoding='utf-8') as xf, ExitStack() as elements:
+            xf.write_declaration()
+            for level, (tag, attrib) in enumerate(container_path):
+                if level:
+                    xf.write("\n" + XML_INDENT * level)
+                elements.enter_context(xf.element(tag, attrib, nsmap=nsmap if level == 0 else None))
+                # 关闭各级元素前先换行缩进（ExitStack按相反顺序执行）
+                elements.callback(xf.write, "\n" + XML_INDENT * level)
+            
+            # 按顺序合并所有文件的记录
+            for i, file_path in enumerate(xml_file_paths, 1):
+                self._print_merge_progress(i, len(xml_file_paths), file_path)
+                
+                for _, record in LET.iterparse(file_path, events=('end',), tag='record',
+                                               remove_blank_text=True, **LXML_PARSE_OPTIONS):
+                    xf.write("\n" + XML_INDENT * depth)
+                    if pretty_print:
+                        LET.indent(record, space=XML_INDENT, level=depth)
+                    xf.write(record)
+                    total_merged_records += 1
+                    record.clear()
+                    while record.getprevious() is not None:
+                        del record.getparent()[0]
+        
+        return total_merged_records
+    
+    def _etree_stream_merge_xml(self, xml_file_paths, output_xml_path, pretty_print=False):
+        """
+        没有lxml时用标准库流式合并：iterparse逐条读取<record>，序列化后立即写出并从父元素移除
+        
+        容器元素带命名空间时（需要前缀映射）回退到内存合并；返回合并的记录数
+        """
+        container_path, _ = self._records_container_path(xml_file_paths[0])
+        if _has_namespaced_names(container_path):
+            return self._tree_merge_xml(xml_file_paths, output_xml_path, pretty_print)
+        
+        depth = len(container_path)
+        opening, closing = _container_tags(container_path)
+        total_merged_records = 0
+        
+        with open(output_xml_path, 'w', encoding='utf-8') as out:
+            out.write("<?xml version='1.0' encoding='utf-8'?>\n")
+            out.write(opening)
+            
+            # 按顺序合并所有文件的记录
+            for i, file_path in enumerate(xml_file_paths, 1):
+                self._print_merge_progress(i, len(xml_file_paths), file_path)
+                
+                parents = []
+                for event, elem in _safe_iterparse(file_path, events=('start', 'end')):
+                    if event == 'start':
+                        parents.append(elem)
+                        continue
+                    parents.pop()
+                    if elem.tag != 'record':
+                        continue
+                    
+                    elem.tail = None
+                    if pretty_print:
+                        ET.indent(elem, space=XML_INDENT, level=depth)
+                    out.write(XML_INDENT * depth)
+                    out.write(ET.tostring(elem, encoding='unicode'))
+                    out.write("\n")
+                    total_merged_records += 1
+                    if parents:
+                        parents[-1].remove(elem)
+            
+            out.write(closing)
+        
+        return total_merged_records
+    
+    def _parallel_merge_xml(self, xml_file_paths, output_xml_path, pretty_print, workers):
+        """
+        多进程合并：各批次文件在工作进程中解析并序列化为记录字节，主进程按批次顺序写出
+        
+        每个进程最多保留一个待写出的结果，内存占用只与这几个文件的大小有关；
+        容器元素带命名空间时回退到单进程流式合并。返回合并的记录数
+        """
+        container_path, _ = self._records_container_path(xml_file_paths[0])
+        if _has_namespaced_names(container_path):
+            if LET is not None:
+                return self._stream_merge_xml(xml_file_paths, output_xml_path, pretty_print)
+            return self._tree_merge_xml(xml_file_paths, output_xml_path, pretty_print)
+        
+        depth = len(container_path)
+        opening, closing = _container_tags(container_path)
+        total_merged_records = 0
+        pending = deque()
+        
+        def write_next():
+            nonlocal total_merged_records
+            i, file_path, future = pending.popleft()
+            data, count = future.result()
+            self._print_merge_progress(i, len(xml_file_paths), file_path)
+            out.write(data)
+            total_merged_records += count
+        
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_merge_process_context()) as executor, \
+                open(output_xml_path, 'wb') as out:
+            out.write(b"<?xml version='1.0' encoding='utf-8'?>\n")
+            out.write(opening.encode('utf-8'))
+            
+            for i, file_path in enumerate(xml_file_paths, 1):
+                pending.append((i, file_path, executor.submit(serialize_xml_records, file_path, depth, pretty_print)))
+                if len(pending) >= workers:
+                    write_next()
+            while pending:
+                write_next()
+            
+            out.write(closing.encode('utf-8'))
+        
+        return total_merged_records
+    
+    def _tree_merge_xml(self, xml_file_paths, output_xml_path, pretty_print=False):
+        """以第一个文件为基础结构，在内存中合并后一次写出；返回合并的记录数"""
+        # 解析第一个文件作为基础结构
+        tree = _safe_parse(xml_file_paths[0])
+        root = tree.getroot()
+        
+        # 获取records容器
+        records_container = root.find('.//records')
+        if records_container is None:
+            # 如果没有records容器，创建一个
+            records_container = ET.SubElement(root, 'records')
+        else:
+            # 清空现有记录
+            records_container.clear()
+        
+        total_merged_records = 0
+        
+        # 按顺序合并所有文件的记录
+        for i, file_path in enumerate(xml_file_paths, 1):
+            self._print_merge_progress(i, len(xml_file_paths), file_path)
+            
+            # 解析当前文件，将记录添加到主文件
+            for record in _safe_parse(file_path).getroot().findall('.//record'):
+                records_container.append(record)
+                total_merged_records += 1
+        
+        # 保存合并后的文件
+        if pretty_print:
+            ET.indent(tree, space=XML_INDENT, level=0)  # 格式化XML
+        tree.write(output_xml_path, encoding='utf-8', xml_declaration=True)
+        return total_merged_records
+    
     def merge_excel_files(self, excel_file_paths, output_excel_path):
         """
         合并多个Excel文件，保持记录顺序
@@ -121,13 +461,8 @@ class ResultMerger:
             output_excel_path (str): 输出Excel文件路径
         """
         try:
-            try:
-                from i18n.i18n_manager import get_message
-                print(f"\n{get_message('excel_merge_start')}")
-                print(get_message("files_to_merge", count=len(excel_file_paths)))
-            except:
-                print(f"\n📊 Starting Excel file merge...")
-                print(f"Files to merge: {len(excel_file_paths)}")
+            print(f"\n{get_message('excel_merge_start')}")
+            print(get_message("files_to_merge", count=len(excel_file_paths)))
             
             # 检查所有文件是否存在
             missing_files = []
@@ -141,17 +476,21 @@ class ResultMerger:
             merged_dataframes = []
             total_merged_records = 0
             
-            # 按顺序读取并合并所有Excel文件
-            for i, file_path in enumerate(excel_file_paths, 1):
-                try:
-                    from i18n.i18n_manager import get_message
-                    print(get_message("excel_processing_file", current=i, total=len(excel_file_paths), filename=os.path.basename(file_path)))
-                except:
-                    print(f"  Processing file {i}/{len(excel_file_paths)}: {os.path.basename(file_path)}")
+            # 各文件的解压与解析相互独立，用线程池并发读取；结果仍按文件顺序取出
+            read_workers = self.read_workers or min(MAX_MERGE_READ_WORKERS, len(excel_file_paths))
+            with ThreadPoolExecutor(max_workers=max(read_workers, 1)) as executor:
+                if read_workers > 1:
+                    frames = executor.map(_read_excel_or_error, excel_file_paths)
+                else:
+                    frames = map(_read_excel_or_error, excel_file_paths)
                 
-                try:
-                    # 读取Excel文件
-                    df = pd.read_excel(file_path)
+                # 按顺序合并所有Excel文件
+                for i, (file_path, df) in enumerate(zip(excel_file_paths, frames), 1):
+                    print(get_message("excel_processing_file", current=i, total=len(excel_file_paths), filename=os.path.basename(file_path)))
+                    
+                    if isinstance(df, Exception):
+                        print(f"    ⚠️  读取文件失败: {str(df)}")
+                        continue
                     
                     if not df.empty:
                         merged_dataframes.append(df)
@@ -159,32 +498,25 @@ class ResultMerger:
                         print(f"    - 读取 {len(df)} 条记录")
                     else:
                         print(f"    - 文件为空，跳过")
-                        
-                except Exception as e:
-                    print(f"    ⚠️  读取文件失败: {str(e)}")
-                    continue
             
             if not merged_dataframes:
                 raise ValueError("没有有效的Excel文件可以合并")
             
-            # 合并所有DataFrame
-            final_df = pd.concat(merged_dataframes, ignore_index=True)
+            # 合并所有DataFrame（各文件列相同，不排序列）
+            batch_sizes = [len(df) for df in merged_dataframes]
+            final_df = pd.concat(merged_dataframes, ignore_index=True, sort=False)
+            
+            # 合并结果已是独立副本，立即释放各文件的DataFrame，写出时内存中只保留一份数据
+            merged_dataframes.clear()
             
-            # 添加批次信息（可选）
+            # 添加批次信息（可选）：按各文件行数重复批次编号，不逐行构建列表
             if 'batch_id' not in final_df.columns:
-                batch_info = []
-                current_batch = 1
-                current_count = 0
-                
-                for df in merged_dataframes:
-                    batch_size = len(df)
-                    batch_info.extend([current_batch] * batch_size)
-                    current_batch += 1
-                
-                final_df['batch_id'] = batch_info
+                final_df['batch_id'] = np.repeat(
+                    np.arange(1, len(batch_sizes) + 1, dtype=np.int32), batch_sizes
+                )
             
             # 保存合并后的文件
-            final_df.to_excel(output_excel_path, index=False)
+            write_excel_sheet(final_df, output_excel_path)
             
             print(f"✓ Excel合并完成: {total_merged_records} 条记录")
             print(f"✓ 输出文件: {output_excel_path}")
@@ -439,7 +771,8 @@ class ResultMerger:
             
             # 收集所有token CSV文件
             token_csv_files = []
-            all_tokens_log = []
+            token_tables = []
+            total_token_records = 0
             
             for batch in completed_batches:
                 if 'output_files' in batch:
@@ -454,29 +787,26 @@ class ResultMerger:
                             token_csv_files.append(token_csv)
                             print(f"  找到批次 {batch['batch_id']} 的token统计: {os.path.basename(token_csv)}")
                             
-                            # 读取CSV数据
+                            # 读取CSV数据（保持列式，合并后再统一转换）
                             try:
-                                import pandas as pd
-                                df = pd.read_csv(token_csv)
-                                batch_tokens = df.to_dict('records')
-                                all_tokens_log.extend(batch_tokens)
+                                table = read_token_csv(token_csv)
+                                if len(table):
+                                    token_tables.append(table)
+                                    total_token_records += len(table)
                             except Exception as e:
                                 print(f"    ⚠️  读取失败: {str(e)}")
                         else:
                             print(f"  批次 {batch['batch_id']} 没有找到token统计文件")
             
-            if not all_tokens_log:
+            if not total_token_records:
                 print("⚠️  没有找到有效的token统计数据")
                 return None
             
-            print(f"📋 总计收集到 {len(all_tokens_log)} 条token使用记录")
+            print(f"📋 总计收集到 {total_token_records} 条token使用记录")
             
             # 保存合并后的token统计CSV
             merged_csv_path = self.output_directory / f"final_tokens_usage_{timestamp}.csv"
-            
-            import pandas as pd
-            merged_df = pd.DataFrame(all_tokens_log)
-            merged_df.to_csv(merged_csv_path, index=False)
+            all_tokens_log = write_token_csv(token_tables, merged_csv_path)
             print(f"✓ 合并token统计CSV: {merged_csv_path}")
             
             # 计算并保存成本分析
@@ -570,9 +900,8 @@ def merge_results_from_state(state_file_path, output_directory,
         backup_individual (bool): 是否备份个别文件
     """
     try:
-        # 读取状态文件
-        with open(state_file_path, 'r', encoding='utf-8') as f:
-            state = json.load(f)
+        # 读取状态文件（合并批次事件日志）
+        state = load_state(state_file_path)
         
         # 创建合并器
         merger = ResultMerger(output_directory, final_output_prefix)
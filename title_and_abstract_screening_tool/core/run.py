@@ -74,7 +74,8 @@ def main():
             screening_llm_configs=llm_configs['screening_llms'],
             prompt_llm_config=llm_configs.get('prompt_llm'),
             positive_prompt_path=paths.get('positive_prompt_file_path'),
-            negative_prompt_path=paths.get('negative_prompt_file_path')
+            negative_prompt_path=paths.get('negative_prompt_file_path'),
+            max_concurrent_studies=processing.get('concurrent_studies', 1)
         )
         
         # Parse XML file (automatic format detection)
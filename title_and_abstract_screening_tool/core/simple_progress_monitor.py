@@ -5,11 +5,12 @@ Simplified progress monitoring for parallel screening with minimal output
 """
 
 import os
-import json
 import time
 import threading
 from datetime import datetime
 
+from state_store import load_state
+
 
 class SimpleProgressMonitor:
     """简化的进度监控器"""
@@ -60,8 +61,7 @@ class SimpleProgressMonitor:
             if not os.path.exists(self.state_file_path):
                 return None
             
-            with open(self.state_file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return load_state(self.state_file_path)
         except Exception:
             return None
     
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+并行筛选状态存储
+状态文件只保存会话快照，批次状态变化以JSON Lines事件追加写入，读取时合并
+"""
+
+import os
+import json
+import mmap
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+_append_lock = threading.Lock()
+
+# 当前线程已持有的状态文件锁 {锁文件路径: 嵌套深度}，同一线程内重复加锁直接通过
+_held_locks = threading.local()
+
+# 已解析状态的缓存：{状态文件路径: (文件版本, 状态)}
+_state_cache = {}
+
+# 超过此大小的状态快照用ijson流式解析，否则映射整个文件一次解析
+STREAMING_SNAPSHOT_BYTES = 8 * 1024 * 1024
+
+
+def event_log_path(state_file_path):
+    """批次事件日志路径"""
+    return f"{state_file_path}.events.jsonl"
+
+
+def lock_file_path(state_file_path):
+    """跨进程状态文件锁的路径（锁文件创建后不删除，所有进程始终锁同一个inode）"""
+    return f"{state_file_path}.lock"
+
+
+@contextmanager
+def state_file_lock(state_file_path, shared=False):
+    """
+    跨进程的状态文件锁（POSIX使用flock，Windows使用msvcrt.locking，后者只有独占锁）
+    
+    写状态快照或事件日志时持独占锁，读取时持共享锁，保证读到的快照与事件日志属于同一会话
+    """
+    path = lock_file_path(state_file_path)
+    depth = getattr(_held_locks, 'depth', None)
+    if depth is None:
+        depth = _held_locks.depth = {}
+    if depth.get(path):
+        depth[path] += 1
+        try:
+            yield
+        finally:
+            depth[path] -= 1
+        return
+    
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        depth[path] = 1
+        try:
+            yield
+        finally:
+            depth[path] = 0
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def make_batch_event(batch_id, status, extra_data=None, timestamp=None):
+    """构造一条批次状态事件（未提供timestamp时取构造时刻）"""
+    event = {'ts': timestamp or datetime.now().isoformat(), 'batch_id': batch_id, 'status': status}
+    if extra_data:
+        event.update(extra_data)
+    return event
+
+
+def _event_line(event):
+    if orjson is not None:
+        return orjson.dumps(event) + b"\n"
+    return json.dumps(event, ensure_ascii=False).encode('utf-8') + b"\n"
+
+
+def append_batch_events(state_file_path, events, durable=False):
+    """
+    一次写入追加多条批次状态事件
+    
+    durable为True时写入后fsync，保证进程或系统崩溃后事件仍在；否则交给操作系统择机落盘
+    """
+    if not events:
+        return
+    data = b"".join(_event_line(event) for event in events)
+    with _append_lock, state_file_lock(state_file_path):
+        with open(event_log_path(state_file_path), 'ab') as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def append_batch_event(state_file_path, batch_id, status, extra_data=None):
+    """追加一条批次状态事件（单行写入，不重写状态文件）"""
+    append_batch_events(state_file_path, [make_batch_event(batch_id, status, extra_data)])
+
+
+def reset_batch_events(state_file_path):
+    """删除事件日志（新会话开始或清理时调用）"""
+    path = event_log_path(state_file_path)
+    with state_file_lock(state_file_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def read_batch_events(path):
+    """
+    解析事件日志中的全部事件
+    
+    各行拼成一个JSON数组一次解析（orjson优先），只有出现无法解析的行时才逐行解析并跳过坏行
+    """
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(path, 'rb') as f:
+        lines = [line for line in f.read().splitlines() if line.strip()]
+    try:
+        return loads(b"[" + b",".join(lines) + b"]")
+    except ValueError:
+        pass
+    
+    events = []
+    for line in lines:
+        try:
+            events.append(loads(line))
+        except ValueError:
+            # 进程中断时可能残留不完整的最后一行
+            continue
+    return events
+
+
+def apply_batch_events(state, state_file_path):
+    """按顺序将事件日志中的批次状态合并到状态快照"""
+    path = event_log_path(state_file_path)
+    if not os.path.exists(path):
+        return state
+
+    batches = {batch['batch_id']: batch for batch in state.get('batches', [])}
+    for event in read_batch_events(path):
+        batch = batches.get(event.pop('batch_id', None))
+        if batch is None:
+            continue
+        event.pop('ts', None)
+        batch.update(event)
+    return state
+
+
+def read_snapshot(state_file_path):
+    """
+    读取状态快照
+    
+    有orjson时将文件mmap后直接解析页缓存中的内容，不复制出整个文件的bytes；
+    快照很大（或没有orjson）时用ijson逐项流式解析；两者都没有时使用json
+    """
+    with open(state_file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if ijson is not None and (orjson is None or size > STREAMING_SNAPSHOT_BYTES):
+            return dict(ijson.kvitems(f, '', use_float=True))
+        if orjson is not None and size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+                return orjson.loads(view)
+        return json.loads(f.read())
+
+
+def load_state(state_file_path):
+    """读取状态快照并合并批次事件，得到最新状态"""
+    with state_file_lock(state_file_path, shared=True):
+        return apply_batch_events(read_snapshot(state_file_path), state_file_path)
+
+
+def _state_version(state_file_path):
+    """状态快照与事件日志的 (mtime_ns, size)，任一变化即视为新版本"""
+    snapshot = os.stat(state_file_path)
+    try:
+        events = os.stat(event_log_path(state_file_path))
+        events_version = (events.st_mtime_ns, events.st_size)
+    except FileNotFoundError:
+        events_version = None
+    return snapshot.st_mtime_ns, snapshot.st_size, events_version
+
+
+def load_state_cached(state_file_path):
+    """
+    读取最新状态；文件未变化时直接返回上次解析的结果
+    
+    返回的状态可能被多次调用共享，调用方只能读取，不能修改
+    """
+    version = _state_version(state_file_path)
+    cached = _state_cache.get(state_file_path)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    state = load_state(state_file_path)
+    _state_cache[state_file_path] = (version, state)
+    return state
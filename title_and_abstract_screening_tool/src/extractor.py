@@ -9,6 +9,8 @@ import os
 import csv
 from datetime import datetime
 import time
+import threading
+from collections import deque
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 
@@ -16,7 +18,7 @@ from .study_design_prefilter import StudyDesignPrefilter
 from .xml_parser import UniversalXMLParser
 
 class SystematicReviewExtractor:
-    def __init__(self, screening_llm_configs, prompt_llm_config=None, positive_prompt_path=None, negative_prompt_path=None):
+    def __init__(self, screening_llm_configs, prompt_llm_config=None, positive_prompt_path=None, negative_prompt_path=None, rate_limiter=None, max_concurrent_studies=1):
         """Initialize extractor with LLM configurations"""
         self.screening_llm_configs = screening_llm_configs
         self.prompt_llm_config = prompt_llm_config or list(screening_llm_configs.values())[0]
@@ -35,6 +37,11 @@ class SystematicReviewExtractor:
         
         self.tokens_log = []
         self.tokens_csv_path = None
+        self.rate_limiter = rate_limiter
+        # Number of studies whose LLM requests may be in flight at the same time
+        self.max_concurrent_studies = max(1, int(max_concurrent_studies or 1))
+        # Per-thread buffer for the progress output of a study screened in a worker thread
+        self._study_output = threading.local()
         
         # Initialize screening LLM clients
         for llm_name, config in self.screening_llm_configs.items():
@@ -62,6 +69,16 @@ class SystematicReviewExtractor:
         self.excluded_study_designs = []
         self.included_study_designs = []
         
+    def reset_token_usage(self):
+        """Start a new token usage log, e.g. before reusing the extractor for another input file"""
+        self.tokens_log = []
+        self.tokens_csv_path = None
+        
+    def _wait_for_rate_limit(self):
+        """Block until the shared rate limiter allows another API request"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        
     def set_excluded_study_designs(self, excluded_designs):
         """Set study design types to exclude"""
         self.excluded_study_designs = excluded_designs
@@ -263,6 +280,7 @@ class SystematicReviewExtractor:
                 client = self.llm_clients[self.prompt_llm_name]
                 config = self.prompt_llm_config if self.prompt_llm_name == "Prompt LLM" else self.screening_llm_configs[self.prompt_llm_name]
                 
+                self._wait_for_rate_limit()
                 response = client.chat.completions.create(
                     model=config['model'],
                     messages=[
@@ -467,6 +485,7 @@ class SystematicReviewExtractor:
                 client = self.llm_clients[self.prompt_llm_name]
                 config = self.prompt_llm_config if self.prompt_llm_name == "Prompt LLM" else self.screening_llm_configs[self.prompt_llm_name]
                 
+                self._wait_for_rate_limit()
                 response = client.chat.completions.create(
                     model=config['model'],
                     messages=[
@@ -586,15 +605,9 @@ class SystematicReviewExtractor:
 
     def process_study_sequential(self, title, abstract, inclusion_criteria):
         """Sequential processing of one study: LLM A processes first, then LLM B uses appropriate prompt based on result"""
-        print("  Starting sequential processing of one study...")
-        
-        # Ensure we have the combined prompt
-        if self.combined_prompt is None:
-            self.combined_prompt = self.create_combined_prompt(inclusion_criteria)
+        self._study_print("  Starting sequential processing of one study...")
         
-        # Load or generate positive and negative versions of prompt
-        if self.positive_prompt is None or self.negative_prompt is None:
-            self.positive_prompt, self.negative_prompt = self.load_or_generate_positive_negative_prompts(self.combined_prompt)
+        self._ensure_screening_prompts(inclusion_criteria)
         
         # Get LLM names list (filter out comment keys)
         llm_names = [name for name in self.screening_llm_configs.keys() 
@@ -609,7 +622,7 @@ class SystematicReviewExtractor:
         results = {}
         
         # Step 1: LLM A processes with normal prompt
-        print(f"  Step 1: {llm_a_name} processing with normal prompt...")
+        self._study_print(f"  Step 1: {llm_a_name} processing with normal prompt...")
         try:
             picos_a, inclusion_a = self.process_study_with_prompt(
                 llm_a_name, title, abstract, self.combined_prompt
@@ -618,7 +631,7 @@ class SystematicReviewExtractor:
                 'picos': picos_a,
                 'inclusion': inclusion_a
             }
-            print(f"  {llm_a_name} completed: {inclusion_a}")
+            self._study_print(f"  {llm_a_name} completed: {inclusion_a}")
             
             # Determine LLM A's decision
             if "✅ INCLUDE" in inclusion_a:
@@ -632,19 +645,19 @@ class SystematicReviewExtractor:
             if llm_a_decision == "INCLUDE":
                 selected_prompt = self.negative_prompt
                 prompt_type = "negative prompt (exclusion criteria prioritized)"
-                print(f"  LLM A result is INCLUDE, LLM B will use {prompt_type}")
+                self._study_print(f"  LLM A result is INCLUDE, LLM B will use {prompt_type}")
             elif llm_a_decision == "EXCLUDE":
                 selected_prompt = self.positive_prompt  
                 prompt_type = "positive prompt (inclusion criteria prioritized)"
-                print(f"  LLM A result is EXCLUDE, LLM B will use {prompt_type}")
+                self._study_print(f"  LLM A result is EXCLUDE, LLM B will use {prompt_type}")
             else:
                 # Use positive prompt for UNCLEAR cases
                 selected_prompt = self.positive_prompt
                 prompt_type = "positive prompt (inclusion criteria prioritized, because LLM A result is unclear)"
-                print(f"  LLM A result is UNCLEAR, LLM B will use {prompt_type}")
+                self._study_print(f"  LLM A result is UNCLEAR, LLM B will use {prompt_type}")
             
             # Step 3: LLM B processes with selected prompt
-            print(f"  Step 2: {llm_b_name} processing with {prompt_type}...")
+            self._study_print(f"  Step 2: {llm_b_name} processing with {prompt_type}...")
             picos_b, inclusion_b = self.process_study_with_prompt(
                 llm_b_name, title, abstract, selected_prompt
             )
@@ -653,10 +666,10 @@ class SystematicReviewExtractor:
                 'inclusion': inclusion_b,
                 'prompt_type': prompt_type
             }
-            print(f"  {llm_b_name} completed: {inclusion_b}")
+            self._study_print(f"  {llm_b_name} completed: {inclusion_b}")
             
         except Exception as e:
-            print(f"  Sequential processing error: {str(e)}")
+            self._study_print(f"  Sequential processing error: {str(e)}")
             # If error occurs, return error information
             error_result = {
                 'picos': {
@@ -671,9 +684,104 @@ class SystematicReviewExtractor:
             results[llm_a_name] = error_result
             results[llm_b_name] = error_result
         
-        print(f"  Sequential processing completed")
+        self._study_print(f"  Sequential processing completed")
         return results
 
+    def _ensure_screening_prompts(self, inclusion_criteria):
+        """Create the combined prompt and load or generate its positive and negative versions"""
+        # Ensure we have the combined prompt
+        if self.combined_prompt is None:
+            self.combined_prompt = self.create_combined_prompt(inclusion_criteria)
+        
+        # Load or generate positive and negative versions of prompt
+        if self.positive_prompt is None or self.negative_prompt is None:
+            self.positive_prompt, self.negative_prompt = self.load_or_generate_positive_negative_prompts(self.combined_prompt)
+
+    def _study_print(self, message):
+        """Print study progress, or buffer it while the study is screened in a worker thread"""
+        lines = getattr(self._study_output, 'lines', None)
+        if lines is None:
+            print(message)
+        else:
+            lines.append(message)
+
+    def _screen_study_timed(self, title, abstract, inclusion_criteria, buffered=False):
+        """Run sequential LLM screening of one study and measure how long it took
+        
+        Returns (results, processing_time, output_lines). With buffered=True the study's progress
+        output is collected into output_lines so it can be printed with its record, in record order.
+        """
+        start_time = time.time()
+        if not buffered:
+            results = self.process_study_sequential(title, abstract, inclusion_criteria)
+            return results, time.time() - start_time, []
+        
+        self._study_output.lines = []
+        try:
+            results = self.process_study_sequential(title, abstract, inclusion_criteria)
+            return results, time.time() - start_time, self._study_output.lines
+        finally:
+            self._study_output.lines = None
+
+    def _iter_screened_records(self, parsed_records, start_index, inclusion_criteria):
+        """Yield (index, prefilter_result, (llm_results, processing_time)) in record order
+        
+        The screening pair is None for records excluded by the prefilter. With max_concurrent_studies > 1
+        the LLM requests of upcoming records run in worker threads while earlier results are written.
+        """
+        total_records = len(parsed_records)
+        
+        def prefilter(index):
+            record_data = parsed_records[index]
+            return self.design_prefilter.check_study_design(
+                record_data['title'], record_data['abstract'],
+                self.excluded_study_designs, self.included_study_designs
+            )
+        
+        if self.max_concurrent_studies == 1:
+            for i in range(start_index, total_records):
+                prefilter_result = prefilter(i)
+                if prefilter_result[0]:
+                    yield i, prefilter_result, None
+                else:
+                    record_data = parsed_records[i]
+                    yield i, prefilter_result, self._screen_study_timed(
+                        record_data['title'], record_data['abstract'], inclusion_criteria
+                    )
+            return
+        
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrent_studies)
+        pending = deque()
+        in_flight = 0
+        try:
+            for i in range(start_index, total_records):
+                prefilter_result = prefilter(i)
+                future = None
+                if not prefilter_result[0]:
+                    # Prompts are prepared once here, before worker threads share them
+                    self._ensure_screening_prompts(inclusion_criteria)
+                    record_data = parsed_records[i]
+                    future = executor.submit(
+                        self._screen_study_timed,
+                        record_data['title'], record_data['abstract'], inclusion_criteria, True
+                    )
+                    in_flight += 1
+                pending.append((i, prefilter_result, future))
+                
+                # Hand back finished records in order until a slot is free for the next request
+                while pending and (pending[0][2] is None or in_flight >= self.max_concurrent_studies):
+                    index, prefilter_result, future = pending.popleft()
+                    if future is not None:
+                        in_flight -= 1
+                    yield index, prefilter_result, future and future.result()
+            
+            while pending:
+                index, prefilter_result, future = pending.popleft()
+                yield index, prefilter_result, future and future.result()
+        finally:
+            # On interruption, drop queued requests instead of waiting for them
+            executor.shutdown(wait=False, cancel_futures=True)
+
     def process_study_with_prompt(self, llm_name, title, abstract, prompt):
         """Process single study with specified prompt"""
         client = self.llm_clients[llm_name]
@@ -687,6 +795,7 @@ class SystematicReviewExtractor:
         
         while retry_count < max_retries:
             try:
+                self._wait_for_rate_limit()
                 response = client.chat.completions.create(
                     model=config['model'],
                     messages=[
@@ -811,9 +920,9 @@ class SystematicReviewExtractor:
             except Exception as e:
                 if "timeout" in str(e).lower() or "timed out" in str(e).lower():
                     retry_count += 1
-                    print(f"Timeout error with {llm_name}, attempt {retry_count}/{max_retries}: Response time exceeded 4 minutes. Retrying...")
+                    self._study_print(f"Timeout error with {llm_name}, attempt {retry_count}/{max_retries}: Response time exceeded 4 minutes. Retrying...")
                     if retry_count >= max_retries:
-                        print(f"Failed after {max_retries} timeout attempts with {llm_name}")
+                        self._study_print(f"Failed after {max_retries} timeout attempts with {llm_name}")
                         return {
                             "S": "Error: Response timeout after multiple attempts",
                             "P": "Error: Response timeout after multiple attempts", 
@@ -824,10 +933,10 @@ class SystematicReviewExtractor:
                 else:
                     retry_count += 1
                     if retry_count < max_retries:
-                        print(f"Error with {llm_name}, attempt {retry_count}/{max_retries}: {str(e)}. Retrying...")
+                        self._study_print(f"Error with {llm_name}, attempt {retry_count}/{max_retries}: {str(e)}. Retrying...")
                         time.sleep(2 ** retry_count)
                     else:
-                        print(f"Failed after {max_retries} attempts with {llm_name}: {str(e)}")
+                        self._study_print(f"Failed after {max_retries} attempts with {llm_name}: {str(e)}")
                         return {
                             "S": "Error in extraction after multiple retries",
                             "P": "Error in extraction after multiple retries",
@@ -944,10 +1053,9 @@ class SystematicReviewExtractor:
             # Define temporary file name
             temp_output = output_path.replace(".xml", "_temp.xml")
             
-            for i in range(start_index, total_records):
+            for i, prefilter_result, screening in self._iter_screened_records(parsed_records, start_index, inclusion_criteria):
                 record_data = parsed_records[i]
                 title = record_data['title']
-                abstract = record_data['abstract']
                 keywords_elem = record_data['keywords_elem']
                 record_elem = record_data['record_elem']
                 
@@ -960,13 +1068,8 @@ class SystematicReviewExtractor:
                 progress = f"[{processed_count}/{total_records}]"
                 print(f"\n{progress} Processing: {title[:60]}...")
                 
-                # Record start time
-                start_time = time.time()
-                
                 # Prefilter: check if study design should be excluded
-                should_exclude, design_type, matched_keyword, filter_details = self.design_prefilter.check_study_design(
-                    title, abstract, self.excluded_study_designs, self.included_study_designs
-                )
+                should_exclude, design_type, matched_keyword, filter_details = prefilter_result
                 if should_exclude:
                     prefilter_excluded_count += 1
                     exclusion_message = f"EXCLUDE - {design_type} (matched: {matched_keyword})"
@@ -1010,11 +1113,9 @@ class SystematicReviewExtractor:
                 if start_index > 0 and i >= start_index:
                     self.clear_keywords(keywords_elem)
                 
-                # Sequential processing of study
-                all_results = self.process_study_sequential(title, abstract, inclusion_criteria)
-                                
-                end_time = time.time()
-                processing_time = end_time - start_time
+                all_results, processing_time, study_output = screening
+                for line in study_output:
+                    print(line)
                 print(f"  {progress} Processing completed, time taken: {processing_time:.2f} seconds")
                 
                 # Process and display results
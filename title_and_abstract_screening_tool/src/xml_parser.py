@@ -9,6 +9,13 @@ import os
 import re
 from datetime import datetime
 
+# Prefer defusedxml: no entity expansion or external references
+try:
+    from defusedxml.ElementTree import iterparse as _safe_iterparse, parse as _safe_parse
+except ImportError:
+    _safe_iterparse = ET.iterparse
+    _safe_parse = ET.parse
+
 class XMLFormatDetector:
     """XML format detector for identifying Zotero or EndNote formats"""
     
@@ -20,16 +27,19 @@ class XMLFormatDetector:
             str: 'zotero', 'endnote', or 'unknown'
         """
         try:
-            tree = ET.parse(xml_path)
-            root = tree.getroot()
-            
-            # Check first record
-            first_record = root.find('.//record')
+            # Only the first record is needed, so stream until it has been parsed
+            # instead of building the whole document tree
+            first_record = None
+            with open(xml_path, 'rb') as f:
+                for _, elem in _safe_iterparse(f, events=('end',)):
+                    if elem.tag == 'record':
+                        first_record = elem
+                        break
             if first_record is None:
                 return 'unknown'
             
             # Check source-app attribute
-            source_app = root.find('.//source-app')
+            source_app = first_record.find('.//source-app')
             if source_app is not None:
                 app_name = source_app.get('name', '').lower()
                 if 'zotero' in app_name:
@@ -84,7 +94,7 @@ class UniversalXMLParser:
             raise ValueError(f"Unsupported XML format or unable to identify format")
         
         try:
-            tree = ET.parse(xml_path)
+            tree = _safe_parse(xml_path)
             root = tree.getroot()
             
             # Get all record elements
@@ -108,7 +118,7 @@ class UniversalXMLParser:
     def _parse_zotero_xml(self, xml_path):
         """Parse Zotero format XML"""
         print("Using Zotero parsing scheme...")
-        tree = ET.parse(xml_path)
+        tree = _safe_parse(xml_path)
         root = tree.getroot()
         
         records = root.findall('.//record')
@@ -147,7 +157,7 @@ class UniversalXMLParser:
     def _parse_endnote_xml(self, xml_path):
         """Parse EndNote format XML"""
         print("Using EndNote parsing scheme...")
-        tree = ET.parse(xml_path)
+        tree = _safe_parse(xml_path)
         root = tree.getroot()
         
         records = root.findall('.//record')
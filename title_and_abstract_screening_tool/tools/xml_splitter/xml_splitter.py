@@ -8,6 +8,12 @@ XML文献文件分割工具
 """
 
 import xml.etree.ElementTree as ET
+
+try:
+    from defusedxml.ElementTree import iterparse as _safe_iterparse, parse as _safe_parse
+except ImportError:
+    _safe_iterparse = ET.iterparse
+    _safe_parse = ET.parse
 import os
 import argparse
 import json
@@ -110,6 +116,24 @@ def get_message_fallback(key, **kwargs):
             return message
     return message or key
 
+def iter_records(xml_path):
+    """
+    流式逐条读取XML中的<record>元素
+    
+    每条记录处理完后即从父元素中移除，内存占用不随文件大小增长；
+    defusedxml可用时禁止实体展开与外部引用
+    """
+    parents = []
+    for event, elem in _safe_iterparse(xml_path, events=('start', 'end')):
+        if event == 'start':
+            parents.append(elem)
+            continue
+        parents.pop()
+        if elem.tag == 'record':
+            yield elem
+            if parents:
+                parents[-1].remove(elem)
+
 class XMLSplitter:
     """XML文献文件分割器"""
     
@@ -120,7 +144,7 @@ class XMLSplitter:
     def detect_xml_format(self, xml_path):
         """检测XML文件格式"""
         try:
-            tree = ET.parse(xml_path)
+            tree = _safe_parse(xml_path)
             root = tree.getroot()
             
             # 检查source-app属性
@@ -153,10 +177,7 @@ class XMLSplitter:
     def count_records(self, xml_path):
         """统计XML文件中的记录数量"""
         try:
-            tree = ET.parse(xml_path)
-            root = tree.getroot()
-            records = root.findall('.//record')
-            return len(records)
+            return sum(1 for _ in iter_records(xml_path))
         except Exception as e:
             print(get_message_fallback("record_count_error", error=str(e)))
             return 0
@@ -198,7 +219,7 @@ class XMLSplitter:
         output_path.mkdir(parents=True, exist_ok=True)
         
         # 解析原始XML
-        tree = ET.parse(input_path)
+        tree = _safe_parse(input_path)
         root = tree.getroot()
         records = root.findall('.//record')
         